@@ -31,7 +31,10 @@ class Settings(BaseSettings):
     rag_chunk_overlap: int = 200
     rag_max_context_chunks: int = 6
     
-
+    # Redis Configuration (optional - caches fall back to in-process memory)
+    redis_host: str = ""
+    redis_port: int = 6379
+    redis_password: str = ""
     
     # Application Configuration
     app_env: str = "production"  # Default to production for Cloud Run
@@ -116,6 +119,9 @@ Please set these in Cloud Run service configuration.
         rag_chunk_size: int = 1000
         rag_chunk_overlap: int = 200
         rag_max_context_chunks: int = 6
+        redis_host: str = ""
+        redis_port: int = 6379
+        redis_password: str = ""
         app_env: str = "production"
         app_host: str = "0.0.0.0"
         app_port: int = 8080
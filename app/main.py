@@ -793,6 +793,30 @@ print(f"✓ {len(_router_imports)} essential routers loaded, {len(_deferred_rout
 # app.include_router(packs.router, prefix="/api/packs", tags=["packs"])
 
 
+# Background startup tasks; the event loop only keeps weak references to tasks
+_startup_tasks = set()
+
+
+def _spawn_startup_task(coro):
+    """Run coro in the background, keeping a reference until it finishes"""
+    import asyncio
+    task = asyncio.create_task(coro)
+    _startup_tasks.add(task)
+    task.add_done_callback(_startup_tasks.discard)
+    return task
+
+
+async def initialize_rag_service():
+    """Initialize the shared RAG service ahead of the first query"""
+    try:
+        from app.services.rag_service import rag_service
+        await rag_service.initialize()
+        print("✓ RAG service initialized")
+    except Exception as e:
+        # Don't block startup - the service initializes itself on first query
+        print(f"⚠ Warning: RAG service initialization deferred to first query: {e}")
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
@@ -803,8 +827,11 @@ async def startup_event():
     
     # Load deferred routers in background (don't block startup)
     import asyncio
-    asyncio.create_task(asyncio.to_thread(load_deferred_routers))
+    _spawn_startup_task(asyncio.to_thread(load_deferred_routers))
     print("✓ Deferred router loading started in background")
+    
+    # Authenticate and configure the RAG service now rather than on the first user query
+    _spawn_startup_task(initialize_rag_service())
 
 
 @app.on_event("shutdown")
@@ -117,3 +117,11 @@ class GenerateLessonPlanRequest(BaseModel):
     hours_per_day: float = Field(default=2.0, ge=0.5, le=8.0)
 
 
+class GenerateBulkLessonPlansRequest(BaseModel):
+    """Request model for generating lesson plans for several students at once"""
+    user_ids: List[str] = Field(..., min_length=1, max_length=100)
+    subject: Subject
+    days: int = Field(default=7, ge=1, le=30)
+    hours_per_day: float = Field(default=2.0, ge=0.5, le=8.0)
+
+
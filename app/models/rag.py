@@ -22,6 +22,7 @@ class RAGQuery(BaseModel):
     """RAG query model"""
     query: str
     subject: Optional[Subject] = None
+    subject_as_boost: bool = False  # Rank the subject's content first instead of excluding other subjects
     top_k: int = Field(default=5, ge=1, le=20)
     confidence_threshold: float = Field(default=0.7, ge=0, le=1)
     filters: dict = Field(default_factory=dict)
@@ -357,10 +357,9 @@ async def get_content_status(
     """
     try:
         from app.services.content_service import content_service
-        from supabase import create_client
-        from app.config import settings
+        from app.utils.supabase_client import get_supabase_client
         
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
+        supabase = get_supabase_client()
         content_response = supabase.table("content")\
             .select("id, processing_status, metadata, embedding_id, processing_started_at, processing_completed_at")\
             .eq("id", content_id)\
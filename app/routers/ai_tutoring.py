@@ -1,16 +1,18 @@
 """AI Tutoring endpoints for enhanced feedback and study planning"""
 
+import json
 from typing import Optional
 from fastapi import APIRouter, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from app.models.ai_features import (
     FeedbackRequest, StudyPlanRequest, QuestionAnswerRequest,
-    CreateSessionRequest, SendMessageRequest, GenerateLessonPlanRequest
+    CreateSessionRequest, SendMessageRequest, GenerateLessonPlanRequest,
+    GenerateBulkLessonPlansRequest
 )
 from app.services.ai_tutoring_service import AITutoringService
 from app.services.enhanced_ai_tutor_service import EnhancedAITutorService
 from app.utils.exceptions import APIException
-from supabase import create_client
-from app.config import settings
+from app.utils.supabase_client import get_supabase_client
 
 router = APIRouter(prefix="/ai-tutoring", tags=["AI Tutoring"])
 
@@ -25,29 +27,6 @@ async def health_check():
     }
 
 
-# Initialize Supabase client (lazy initialization to handle missing settings)
-def get_supabase_client():
-    """Get Supabase client, creating it if needed"""
-    if not hasattr(get_supabase_client, '_client'):
-        if not settings.supabase_url or not settings.supabase_service_key:
-            raise APIException(
-                code="SUPABASE_CONFIG_MISSING",
-                message="Supabase configuration is missing. Please set SUPABASE_URL and SUPABASE_SERVICE_KEY.",
-                status_code=500
-            )
-        try:
-            get_supabase_client._client = create_client(
-                settings.supabase_url,
-                settings.supabase_service_key
-            )
-        except Exception as e:
-            raise APIException(
-                code="SUPABASE_CLIENT_ERROR",
-                message=f"Failed to create Supabase client: {str(e)}",
-                status_code=500
-            )
-    return get_supabase_client._client
-
 def get_ai_tutoring_service():
     """Get AI tutoring service, creating it if needed"""
     if not hasattr(get_ai_tutoring_service, '_service'):
@@ -340,6 +319,40 @@ async def send_message(request: SendMessageRequest):
         )
 
 
+@router.post("/sessions/message/stream")
+async def stream_message(request: SendMessageRequest):
+    """
+    Send a message in a session and stream the AI response as server-sent events
+    
+    Emits `token` events with response text as it is generated, then a single
+    `result` event with the same payload as POST /sessions/message (or an
+    `error` event).
+    
+    Args:
+        request: Message request
+    """
+    service = get_enhanced_ai_tutor_service()
+    
+    async def event_stream():
+        try:
+            async for event, data in service.stream_message(
+                session_id=request.session_id,
+                user_id=request.user_id,
+                content=request.content,
+                subject=request.subject,
+                message_type=request.message_type
+            ):
+                if event == "result":
+                    data = {"success": True, **data}
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        except APIException as e:
+            yield f"event: error\ndata: {json.dumps({'code': e.code, 'message': e.message})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'message': f'Failed to send message: {str(e)}'})}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.post("/lesson-plans/generate")
 async def generate_lesson_plan(request: GenerateLessonPlanRequest):
     """
@@ -372,11 +385,45 @@ async def generate_lesson_plan(request: GenerateLessonPlanRequest):
         )
 
 
+@router.post("/lesson-plans/generate-bulk")
+async def generate_lesson_plans_bulk(request: GenerateBulkLessonPlansRequest):
+    """
+    Generate performance-based lesson plans for several students, e.g. a class
+    
+    Args:
+        request: Bulk lesson plan generation request
+    
+    Returns:
+        Generated lesson plans and per-student errors
+    """
+    try:
+        service = get_enhanced_ai_tutor_service()
+        result = await service.generate_lesson_plans_bulk(
+            user_ids=request.user_ids,
+            subject=request.subject,
+            days=request.days,
+            hours_per_day=request.hours_per_day
+        )
+        return {
+            "success": True,
+            **result
+        }
+    except APIException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate lesson plans: {str(e)}"
+        )
+
+
 @router.get("/lesson-plans")
 async def get_lesson_plans(
     user_id: str = Query(..., description="User ID"),
     subject: Optional[str] = Query(None, description="Subject filter"),
-    is_active: Optional[bool] = Query(True, description="Filter by active status")
+    is_active: Optional[bool] = Query(True, description="Filter by active status"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, description="Pagination offset", ge=0)
 ):
     """
     Get lesson plans for a user
@@ -385,9 +432,11 @@ async def get_lesson_plans(
         user_id: User ID
         subject: Optional subject filter
         is_active: Filter by active status
+        limit: Maximum number of plans to return
+        offset: Pagination offset
     
     Returns:
-        List of lesson plans
+        List of lesson plan summaries (without plan_data)
     """
     try:
         from app.models.base import Subject as SubjectEnum
@@ -403,7 +452,9 @@ async def get_lesson_plans(
         lesson_plans = await service.get_lesson_plans(
             user_id=user_id,
             subject=subject_enum,
-            is_active=is_active
+            is_active=is_active,
+            limit=limit,
+            offset=offset
         )
         return {
             "success": True,
@@ -419,6 +470,37 @@ async def get_lesson_plans(
         )
 
 
+@router.get("/lesson-plans/{plan_id}")
+async def get_lesson_plan(
+    plan_id: str,
+    user_id: str = Query(..., description="User ID")
+):
+    """
+    Get a single lesson plan with its full schedule
+    
+    Args:
+        plan_id: Lesson plan ID
+        user_id: User ID
+    
+    Returns:
+        Lesson plan including plan_data
+    """
+    try:
+        service = get_enhanced_ai_tutor_service()
+        lesson_plan = await service.get_lesson_plan(user_id=user_id, plan_id=plan_id)
+        return {
+            "success": True,
+            "lesson_plan": lesson_plan
+        }
+    except APIException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch lesson plan: {str(e)}"
+        )
+
+
 @router.get("/teacher/student-sessions")
 async def get_teacher_student_sessions(
     teacher_id: str = Query(..., description="Teacher ID"),
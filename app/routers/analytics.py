@@ -6,17 +6,11 @@ from supabase import Client
 
 from app.models.base import Subject
 from app.services.analytics_service import AnalyticsService
-from app.config import settings
-from supabase import create_client
+from app.utils.supabase_client import get_supabase_client
 
 router = APIRouter()
 
 
-def get_supabase_client() -> Client:
-    """Get Supabase client"""
-    return create_client(settings.supabase_url, settings.supabase_service_key)
-
-
 def get_analytics_service(supabase: Client = Depends(get_supabase_client)) -> AnalyticsService:
     """Get analytics service instance"""
     return AnalyticsService(supabase)
@@ -566,14 +566,11 @@ async def create_enhanced_ai_tutor_session(
     """Create an enhanced AI tutor session with MemMachine and Neo4j integration"""
     try:
         # Import here to avoid circular imports
-        from app.services.enhanced_ai_tutor_service import EnhancedAITutorService
+        from app.routers.ai_tutoring import get_enhanced_ai_tutor_service
         from app.models.base import Subject
-        from supabase import create_client
-        from app.config import settings
         
-        # Create service instance (in production, this should be a singleton)
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
-        tutor_service = EnhancedAITutorService(supabase)
+        # Shared service instance, so session memory survives across requests
+        tutor_service = get_enhanced_ai_tutor_service()
         
         # Convert subject string to enum if provided
         subject_enum = None
@@ -612,13 +609,10 @@ async def send_enhanced_message(
 ):
     """Send a message to the enhanced AI tutor with full intelligence integration"""
     try:
-        from app.services.enhanced_ai_tutor_service import EnhancedAITutorService
+        from app.routers.ai_tutoring import get_enhanced_ai_tutor_service
         from app.models.base import Subject
-        from supabase import create_client
-        from app.config import settings
         
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
-        tutor_service = EnhancedAITutorService(supabase)
+        tutor_service = get_enhanced_ai_tutor_service()
         
         content = message_data.get("content", "")
         subject_str = message_data.get("subject")
@@ -652,12 +646,9 @@ async def send_enhanced_message(
 async def get_comprehensive_learning_insights(user_id: str):
     """Get comprehensive learning insights combining MemMachine and Neo4j data"""
     try:
-        from app.services.enhanced_ai_tutor_service import EnhancedAITutorService
-        from supabase import create_client
-        from app.config import settings
+        from app.routers.ai_tutoring import get_enhanced_ai_tutor_service
         
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
-        tutor_service = EnhancedAITutorService(supabase)
+        tutor_service = get_enhanced_ai_tutor_service()
         
         insights = await tutor_service.get_learning_insights(user_id)
         
@@ -677,12 +668,9 @@ async def create_interactive_session_from_chat(
 ):
     """Create an interactive learning session from the AI tutor chat"""
     try:
-        from app.services.enhanced_ai_tutor_service import EnhancedAITutorService
-        from supabase import create_client
-        from app.config import settings
+        from app.routers.ai_tutoring import get_enhanced_ai_tutor_service
         
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
-        tutor_service = EnhancedAITutorService(supabase)
+        tutor_service = get_enhanced_ai_tutor_service()
         
         component_ids = session_data.get("component_ids", [])
         preferences = session_data.get("preferences", {})
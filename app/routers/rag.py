@@ -24,11 +24,12 @@ def _get_gemini_model():
     """Get Gemini model with fallback chain - lazy initialization"""
     from app.config import settings
     import google.generativeai as genai
+    from app.utils.model_helper import configure_gemini
     
     if not settings.gemini_api_key:
         return None
     
-    genai.configure(api_key=settings.gemini_api_key)
+    configure_gemini()
     
     # Try models in order of preference - include all available Gemini models
     # Note: We don't test generation here, just model creation
@@ -149,8 +150,9 @@ Answer:"""
                 logger.info("Model not found, trying fallback models...")
                 from app.config import settings
                 import google.generativeai as genai
+                from app.utils.model_helper import configure_gemini
                 
-                genai.configure(api_key=settings.gemini_api_key)
+                configure_gemini()
                 
                 # Get comprehensive fallback model list
                 fast_chain = getattr(settings, 'gemini_models_fast_chain', 'gemini-2.5-flash,gemini-2.5-flash-lite,gemini-2.0-flash,gemini-2.0-flash-lite,gemini-1.5-flash')
@@ -347,6 +349,7 @@ async def evaluate_answer(request: dict):
     try:
         from app.config import settings
         import google.generativeai as genai
+        from app.utils.model_helper import configure_gemini
         
         question = request.get("question", "")
         user_answer = request.get("user_answer", "")
@@ -367,7 +370,7 @@ async def evaluate_answer(request: dict):
             )
         
         # Initialize Gemini with model fallback
-        genai.configure(api_key=settings.gemini_api_key)
+        configure_gemini()
         
         # Try models in order of preference - use comprehensive model list
         model = None
@@ -464,10 +467,10 @@ Be constructive and specific in your feedback. Focus on helping the student impr
         
         # Try to extract JSON from response
         import json
-        import re
+        from app.utils.model_helper import JSON_OBJECT_RE
         
         # Try to find JSON in the response
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+        json_match = JSON_OBJECT_RE.search(response_text)
         if json_match:
             try:
                 result = json.loads(json_match.group())
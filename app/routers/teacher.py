@@ -25,10 +25,9 @@ async def get_teacher_students(
     """Get all students assigned to teacher's school"""
     try:
         # Get teacher's school
-        from supabase import create_client
-        from app.config import settings
+        from app.utils.supabase_client import get_supabase_client
         
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
+        supabase = get_supabase_client()
         
         # Get teacher profile to find school
         teacher_profile = supabase.table("teacher_profiles").select("school_id").eq("user_id", teacher_id).execute()
@@ -74,10 +73,9 @@ async def get_teacher_dashboard(
 ):
     """Get teacher dashboard with overview stats"""
     try:
-        from supabase import create_client
-        from app.config import settings
+        from app.utils.supabase_client import get_supabase_client
         
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
+        supabase = get_supabase_client()
         
         # Get teacher's school
         teacher_profile = supabase.table("teacher_profiles").select("school_id").eq("user_id", teacher_id).execute()
@@ -159,10 +157,9 @@ async def create_quiz(
     - Created quiz template
     """
     try:
-        from supabase import create_client
-        from app.config import settings
+        from app.utils.supabase_client import get_supabase_client
         
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
+        supabase = get_supabase_client()
         
         # Verify teacher exists
         teacher_profile = supabase.table("teacher_profiles").select("user_id").eq("user_id", quiz_create.teacher_id).execute()
@@ -232,10 +229,9 @@ async def get_teacher_quizzes(
     - List of quiz templates
     """
     try:
-        from supabase import create_client
-        from app.config import settings
+        from app.utils.supabase_client import get_supabase_client
         
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
+        supabase = get_supabase_client()
         
         # Get all quizzes for this teacher
         result = supabase.table("quizzes").select("*").eq("teacher_id", teacher_id).order("created_at", desc=True).execute()
@@ -266,10 +262,9 @@ async def get_quiz(
     - Quiz template
     """
     try:
-        from supabase import create_client
-        from app.config import settings
+        from app.utils.supabase_client import get_supabase_client
         
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
+        supabase = get_supabase_client()
         
         # Get quiz and verify it belongs to the teacher
         result = supabase.table("quizzes").select("*").eq("id", quiz_id).eq("teacher_id", teacher_id).execute()
@@ -304,10 +299,9 @@ async def get_teacher_quiz_sessions(
     - List of quiz sessions with student information
     """
     try:
-        from supabase import create_client
-        from app.config import settings
+        from app.utils.supabase_client import get_supabase_client
         
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
+        supabase = get_supabase_client()
         
         # Get teacher's school
         teacher_profile = supabase.table("teacher_profiles").select("school_id").eq("user_id", teacher_id).execute()
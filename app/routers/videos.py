@@ -10,25 +10,19 @@ from app.models.content import Video, VideoCreate, Timestamp
 from app.models.base import Subject
 from app.services.youtube_service import youtube_service
 # Note: Video indexing functionality removed - now handled by Google RAG services
-from app.config import settings
 from app.utils.exceptions import APIException
-from supabase import create_client
+from app.utils.supabase_client import get_supabase_client
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-def get_supabase() -> Client:
-    """Get Supabase client"""
-    return create_client(settings.supabase_url, settings.supabase_service_key)
-
-
 @router.post("/curate", response_model=Video, status_code=201)
 async def curate_video(
     video_data: VideoCreate,
     background_tasks: BackgroundTasks,
-    supabase: Client = Depends(get_supabase)
+    supabase: Client = Depends(get_supabase_client)
 ):
     """
     Curate a YouTube video by adding it to the platform (Admin only)
@@ -143,7 +137,7 @@ async def curate_video(
 async def get_videos_by_topic(
     topic_id: str,
     limit: int = 10,
-    supabase: Client = Depends(get_supabase)
+    supabase: Client = Depends(get_supabase_client)
 ):
     """
     Get videos associated with a specific topic
@@ -191,7 +185,7 @@ async def get_videos_by_topic(
 async def get_videos_by_subject(
     subject: Subject,
     limit: int = 20,
-    supabase: Client = Depends(get_supabase)
+    supabase: Client = Depends(get_supabase_client)
 ):
     """
     Get videos for a specific subject
@@ -237,7 +231,7 @@ async def get_videos_by_subject(
 @router.get("/{video_id}", response_model=Video)
 async def get_video(
     video_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: Client = Depends(get_supabase_client)
 ):
     """
     Get a specific video by ID
@@ -282,7 +276,7 @@ async def get_video(
 @router.get("/youtube/{youtube_id}", response_model=Video)
 async def get_video_by_youtube_id(
     youtube_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: Client = Depends(get_supabase_client)
 ):
     """
     Get a video by YouTube ID
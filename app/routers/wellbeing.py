@@ -4,16 +4,12 @@ from fastapi import APIRouter, HTTPException, status
 from app.models.ai_features import FocusSessionRequest, FocusSessionEndRequest
 from app.services.wellbeing_service import WellbeingService
 from app.utils.exceptions import APIException
-from supabase import create_client
-from app.config import settings
+from app.utils.supabase_client import get_supabase_client
 
 router = APIRouter(prefix="/wellbeing", tags=["Well-being & Focus"])
 
 # Initialize Supabase client
-supabase_client = create_client(
-    settings.supabase_url,
-    settings.supabase_service_key
-)
+supabase_client = get_supabase_client()
 
 # Initialize service
 wellbeing_service = WellbeingService(supabase_client)
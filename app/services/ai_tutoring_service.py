@@ -3,16 +3,15 @@
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 import json
-import re
 import google.generativeai as genai
 from supabase import Client
-from app.config import settings
+from app.utils.model_helper import configure_gemini, JSON_OBJECT_RE
 from app.models.base import Subject
 from app.utils.exceptions import APIException
 from app.services.wolfram_service import WolframService
 
 # Configure Gemini
-genai.configure(api_key=settings.gemini_api_key)
+configure_gemini()
 
 
 class AITutoringService:
@@ -73,7 +72,7 @@ Format your response as JSON with keys: feedback, strengths, improvements, next_
             feedback_text = response.text
             
             # Parse JSON response (simple extraction)
-            json_match = re.search(r'\{.*\}', feedback_text, re.DOTALL)
+            json_match = JSON_OBJECT_RE.search(feedback_text)
             if json_match:
                 feedback_data = json.loads(json_match.group())
             else:
@@ -176,7 +175,7 @@ Format as JSON with structure:
             plan_text = response.text
             
             # Parse JSON response
-            json_match = re.search(r'\{.*\}', plan_text, re.DOTALL)
+            json_match = JSON_OBJECT_RE.search(plan_text)
             if json_match:
                 plan_data = json.loads(json_match.group())
             else:
@@ -294,7 +293,7 @@ Format as JSON with keys: answer, explanation, examples, step_by_step, practice_
             
             # Parse JSON response
             try:
-                json_match = re.search(r'\{.*\}', answer_text, re.DOTALL)
+                json_match = JSON_OBJECT_RE.search(answer_text)
                 if json_match:
                     answer_data = json.loads(json_match.group())
                 else:
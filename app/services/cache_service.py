@@ -0,0 +1,172 @@
+"""Key-value cache backed by Redis with an in-process fallback"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from app.config import settings
+
+# Try to import the asyncio Redis client, fallback if not available
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    aioredis = None
+
+
+class CacheService:
+    """Async get/set cache used to skip repeated LLM calls and database reads.
+
+    Values must be JSON-serializable. Redis is used when ``REDIS_HOST`` is
+    configured and reachable; otherwise entries live in a bounded in-process
+    LRU so single-instance deployments still benefit. Callers should treat
+    returned values as read-only.
+    """
+
+    def __init__(self, max_local_entries: int = 1024):
+        self._redis = None
+        self._redis_enabled = REDIS_AVAILABLE and bool(getattr(settings, 'redis_host', ''))
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._max_local_entries = max_local_entries
+
+    async def _get_redis(self):
+        """Get or create the Redis client, disabling Redis on connection failure"""
+        if not self._redis_enabled:
+            return None
+
+        if self._redis is None:
+            try:
+                self._redis = aioredis.Redis(
+                    host=settings.redis_host,
+                    port=settings.redis_port,
+                    password=settings.redis_password if settings.redis_password else None,
+                    decode_responses=True,
+                    socket_connect_timeout=2
+                )
+                await self._redis.ping()
+            except Exception as e:
+                print(f"Redis connection failed, using in-process cache: {e}")
+                self._redis = None
+                self._redis_enabled = False
+                return None
+
+        return self._redis
+
+    def _local_get(self, key: str) -> Optional[Any]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _local_set(self, key: str, value: Any, ttl: int):
+        self._local[key] = (time.monotonic() + ttl, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self._max_local_entries:
+            self._local.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss"""
+        redis_client = await self._get_redis()
+        if redis_client is None:
+            return self._local_get(key)
+
+        try:
+            cached = await redis_client.get(key)
+            return json.loads(cached) if cached is not None else None
+        except Exception as e:
+            print(f"Cache retrieval error: {e}")
+            return None
+
+    async def set(self, key: str, value: Any, ttl: int):
+        """Store value under key for ttl seconds"""
+        redis_client = await self._get_redis()
+        if redis_client is None:
+            self._local_set(key, value, ttl)
+            return
+
+        try:
+            await redis_client.setex(key, ttl, json.dumps(value))
+        except Exception as e:
+            print(f"Cache storage error: {e}")
+
+    async def delete(self, key: str):
+        """Remove key from the cache"""
+        self._local.pop(key, None)
+        redis_client = await self._get_redis()
+        if redis_client is None:
+            return
+
+        try:
+            await redis_client.delete(key)
+        except Exception as e:
+            print(f"Cache delete error: {e}")
+
+
+class BoundedTTLDict:
+    """Dict-like in-process store for per-session state that evicts cold entries.
+
+    Entries expire after ``ttl`` seconds without being accessed, and the least
+    recently used entry is dropped once ``maxsize`` is exceeded, so long-lived
+    workers do not keep every session they have ever served. Unlike
+    CacheService, values are stored as-is and may be mutated in place.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 1800):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+
+    def _touch(self, key: Any) -> bool:
+        entry = self._data.get(key)
+        if entry is None:
+            return False
+        now = time.monotonic()
+        if entry[0] < now:
+            del self._data[key]
+            return False
+        self._data[key] = (now + self._ttl, entry[1])
+        self._data.move_to_end(key)
+        return True
+
+    def __contains__(self, key: Any) -> bool:
+        return self._touch(key)
+
+    def __getitem__(self, key: Any) -> Any:
+        if not self._touch(key):
+            raise KeyError(key)
+        return self._data[key][1]
+
+    def __setitem__(self, key: Any, value: Any):
+        self._data[key] = (time.monotonic() + self._ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def __delitem__(self, key: Any):
+        del self._data[key]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return self[key] if self._touch(key) else default
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return entry[1] if entry is not None else default
+
+
+def student_performance_key(user_id: str, subject: str) -> str:
+    """Cache key for a student's per-subject performance summary"""
+    return f"perf:{user_id}:{subject}"
+
+
+# Global instance
+cache_service = CacheService()
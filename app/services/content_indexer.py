@@ -3,7 +3,9 @@
 import logging
 import json
 import asyncio
+import random
 from typing import List, Dict, Optional, Callable, Awaitable
+from google.api_core import exceptions as google_exceptions
 from google.cloud import discoveryengine_v1
 from google.cloud import storage
 from app.models.content import ContentItem
@@ -12,6 +14,12 @@ from app.services.chunking_service import chunking_service
 
 logger = logging.getLogger(__name__)
 
+# Transient Vertex AI errors (429 quota exhaustion, 503 unavailable) worth retrying
+_RETRYABLE_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable)
+_MAX_CREATE_ATTEMPTS = 5
+_RETRY_BASE_DELAY = 0.1  # seconds
+_RETRY_MAX_DELAY = 4.0  # seconds
+
 
 class ContentIndexer:
     """Content indexer for Google Vertex AI Search"""
@@ -170,12 +178,25 @@ class ContentIndexer:
                 document_id=document_id
             )
             
-            # Execute the request
-            operation = self.document_client.create_document(request=request)
-            logger.debug(f"Created document {document_id} in Vertex AI Search")
+            # Execute the request, backing off with full jitter on transient errors;
+            # the last attempt is not retried, so its error decides the result
+            for attempt in range(_MAX_CREATE_ATTEMPTS - 1):
+                try:
+                    self.document_client.create_document(request=request)
+                    break
+                except _RETRYABLE_ERRORS as e:
+                    delay = random.uniform(0, min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * 2 ** attempt))
+                    logger.warning(
+                        "Retrying document %s in %.2fs after transient error: %s",
+                        document_id, delay, e
+                    )
+                    await asyncio.sleep(delay)
+            else:
+                self.document_client.create_document(request=request)
             
+            logger.debug("Created document %s in Vertex AI Search", document_id)
             return True
-            
+
         except Exception as e:
             logger.error(f"Failed to create document {document_id}: {e}")
             return False
@@ -190,7 +211,6 @@ class ContentIndexer:
         
         if update_progress_callback:
             await update_progress_callback("Using fallback indexing (Vertex AI not configured)", 50)
-            await asyncio.sleep(1)  # Simulate processing
             await update_progress_callback("Fallback indexing completed", 100)
         
         return {
@@ -213,6 +233,12 @@ class ContentIndexer:
         """
         Index multiple content items in batches
         """
+        # Drop repeated content items so each one is chunked and sent to Vertex only once
+        unique_items = {}
+        for content_item in content_items:
+            unique_items.setdefault(content_item.id, content_item)
+        content_items = list(unique_items.values())
+        
         logger.info(f"Starting batch indexing for {len(content_items)} items")
         
         indexed_items = 0
@@ -11,6 +11,7 @@ from PIL import Image, ImageEnhance
 from supabase import create_client, Client
 
 from app.config import settings
+from app.utils.model_helper import configure_gemini
 from app.models.doubt import (
     DoubtQuery,
     DoubtResponse,
@@ -60,7 +61,7 @@ Only respond with the JSON, no additional text."""
     def _initialize_gemini(self):
         """Initialize Gemini API"""
         if not self._gemini_initialized:
-            genai.configure(api_key=settings.gemini_api_key)
+            configure_gemini()
             self._gemini_initialized = True
     
     def _get_supabase_client(self) -> Client:
@@ -1,18 +1,27 @@
 """Enhanced AI Tutor Service with conversational interface, persistent memory, and connected reasoning"""
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AbstractSet, AsyncIterator, Tuple
 from datetime import datetime, timedelta
+import asyncio
+import copy
+import hashlib
+import heapq
 import json
 import re
+import time
+import uuid
+import numpy as np
 from supabase import Client
 
 from app.config import settings
+from app.utils.model_helper import configure_gemini, extract_json_object, generate_content_async, token_sink
 from app.models.base import Subject
 from app.utils.exceptions import APIException
 from app.services.rag_service import rag_service
 from app.services.doubt_solver_service import doubt_solver_service
 from app.services.progress_service import progress_service
 from app.models.rag import RAGQuery
+from app.services.cache_service import cache_service, student_performance_key, BoundedTTLDict
 
 # Import MemMachine and Neo4j services for enhanced intelligence
 from app.services.memmachine_service import get_memmachine_service, LearningContext
@@ -27,6 +36,254 @@ except ImportError:
     GEMINI_AVAILABLE = False
     genai = None
 
+# Intent keyword patterns, compiled once. Greetings match whole words only so
+# that e.g. "this" or "which" no longer count as "hi": single-word greetings are
+# a set lookup over the message's words, phrases a small regex.
+_WORD_RE = re.compile(r"[a-z']+")
+_GREETING_WORDS = frozenset({"hello", "hi", "hey", "greetings"})
+_GREETING_PHRASES_RE = re.compile(
+    r"\b(?:good\s+(?:morning|afternoon|evening)|how\s+are\s+you|how's\s+it\s+going|what's\s+up)\b"
+)
+
+# Fixed parts of the session welcome message
+_WELCOME_INTRO = (
+    "I'm your AI tutor with advanced memory and knowledge mapping capabilities{subject_text}. "
+    "I remember our previous conversations and can track your progress across all topics. "
+)
+_WELCOME_FEATURES = (
+    "\n\n🎯 **What I can help you with:**\n"
+    "• **Smart Q&A**: Ask me anything and I'll remember the context\n"
+    "• **Interactive Learning**: Access visual simulations and practice tools\n"
+    "• **Personalized Paths**: Get learning routes based on your progress\n"
+    "• **Knowledge Mapping**: See how concepts connect to each other\n"
+    "• **Memory Insights**: Track your learning patterns over time\n"
+)
+_WELCOME_CLOSING = "\n\nWhat would you like to explore today?"
+
+# Reply templates for the memory query handler; per-item lines are joined
+_MEMORY_STATS_TMPL = (
+    "📈 **Learning Statistics:**\n"
+    "• Total learning sessions: {total}\n"
+    "• Subjects explored: {subjects}\n"
+    "• Learning velocity: {velocity:.1f}x average\n\n"
+)
+_MEMORY_SUBJECT_ITEM_TMPL = "• {subject}: {count} sessions, {avg_performance:.0%} avg performance\n"
+_MEMORY_FOCUS_ITEM_TMPL = "• {topic}: {performance:.0%} mastery ({priority} priority)\n"
+_MEMORY_ACTIVITY_ITEM_TMPL = "• {timestamp}: {subject} - {topic}\n"
+_MEMORY_EMPTY_PROFILE = (
+    "I'm still building your learning profile. Keep interacting with me to develop a comprehensive memory of your learning journey!\n\n"
+    "I'll remember:\n"
+    "• Topics you've studied\n"
+    "• Your performance patterns\n"
+    "• Areas where you excel\n"
+    "• Concepts that need more practice\n"
+)
+_MEMORY_FEATURES = (
+    "\n💡 **Memory Features:**\n"
+    "• I remember all our conversations\n"
+    "• I track your progress across topics\n"
+    "• I identify your learning patterns\n"
+    "• I suggest personalized improvements\n"
+)
+
+# Fixed closing blocks of the other handler replies
+_INTERACTIVE_START_STEPS = (
+    "🚀 **To start an interactive session:**\n"
+    "1. Choose a component from above\n"
+    "2. I'll create a personalized learning session\n"
+    "3. You'll get real-time feedback and progress tracking\n\n"
+    "Which interactive component interests you most?"
+)
+_PERSONALIZED_CLOSING = (
+    "🚀 **What would you like to focus on?**\n"
+    "I can create an interactive learning session tailored to your level!"
+)
+_KNOWLEDGE_GRAPH_PROMPTS = (
+    "🔍 **Ask me about:**\n"
+    "• How concepts connect to each other\n"
+    "• Prerequisites for any topic\n"
+    "• Learning paths to your goals\n"
+    "• Related topics to explore\n\n"
+    "Try asking: 'How does algebra connect to calculus?' or 'What are the prerequisites for derivatives?'"
+)
+_WEAKNESS_STRATEGY = (
+    "🎯 **Improvement Strategy:**\n"
+    "1. Review prerequisites and fundamentals\n"
+    "2. Practice with interactive simulations\n"
+    "3. Solve progressively harder problems\n"
+    "4. Regular review and assessment\n\n"
+    "Which area would you like to work on first? I can create a targeted practice session!"
+)
+
+def _compile_intent_phrases(buckets):
+    """Build a phrase -> (priority, intent) map and one pattern matching every phrase.
+    
+    Buckets are (intent, phrases) pairs, highest priority first. The lookahead
+    reports a match at every position, so overlapping phrases from different
+    buckets are all seen in a single scan of the message.
+    """
+    by_phrase = {
+        phrase: (priority, intent)
+        for priority, (intent, phrases) in enumerate(buckets)
+        for phrase in phrases
+    }
+    pattern = re.compile(
+        "(?=(" + "|".join(
+            re.escape(phrase) for phrase in sorted(by_phrase, key=lambda phrase: (by_phrase[phrase][0], -len(phrase)))
+        ) + "))"
+    )
+    return by_phrase, pattern
+
+
+def _match_intent_phrases(by_phrase, pattern, text: str) -> Optional[str]:
+    """Intent of the highest-priority phrase found in text, or None"""
+    best = None
+    for match in pattern.finditer(text):
+        priority, intent = by_phrase[match.group(1)]
+        if priority == 0:
+            return intent
+        if best is None or priority < best[0]:
+            best = (priority, intent)
+    return best[1] if best is not None else None
+
+
+# Phrase buckets for _classify_intent after the greeting check, highest priority first
+_BASIC_INTENT_BY_PHRASE, _BASIC_INTENT_RE = _compile_intent_phrases((
+    ("homework_help", ("homework", "assignment", "solve this", "help me with", "can you solve", "how do i solve")),
+    ("lesson_plan_request", ("lesson plan", "study plan", "learning plan", "create a plan", "personalized plan", "study schedule")),
+))
+
+# Phrase buckets for _classify_intent_enhanced, highest priority first
+_ENHANCED_INTENT_BY_PHRASE, _ENHANCED_INTENT_RE = _compile_intent_phrases((
+    ("interactive_request", ("show me", "visualize", "simulate", "interactive", "demo", "practice")),
+    ("knowledge_exploration", ("how does", "connect", "relationship", "related to", "prerequisite", "depends on")),
+    ("memory_query", ("my progress", "what did we", "remember", "last time", "history")),
+    ("personalized_request", ("for me", "my level", "personalized", "adapted", "customized")),
+))
+
+# Word lists for _analyze_message_for_learning, matched against the message's words
+_QUESTION_WORDS = frozenset({"what", "how", "why", "explain"})
+_COMPLEXITY_WORDS = frozenset({"because", "however", "therefore", "although", "moreover"})
+_SUBJECT_KEYWORDS = {
+    "mathematics": ("equation", "solve", "calculate", "formula", "graph"),
+    "physics": ("force", "energy", "motion", "velocity", "acceleration"),
+    "chemistry": ("reaction", "molecule", "element", "compound", "bond")
+}
+# Candidate concept names for knowledge exploration: runs of four or more letters
+_CONCEPT_WORD_RE = re.compile(r"[^\W\d_]{4,}")
+_PLAN_DAYS_RE = re.compile(r'(\d+)\s*(?:day|days)')
+_PLAN_HOURS_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:hour|hours)')
+
+# Cache lifetimes for Gemini output; plans embed the performance snapshot in the
+# prompt, so a mastery change produces a new key rather than a stale hit
+GREETING_CACHE_TTL = 7 * 24 * 3600
+LESSON_PLAN_CACHE_TTL = 3600
+
+# Topic lists change rarely; the serialized preamble is reused across students
+LESSON_PREAMBLE_CACHE_TTL = 300
+# Topics listed in the preamble for chat-requested and performance-based plans
+CHAT_LESSON_PLAN_TOPICS = 15
+PERFORMANCE_LESSON_PLAN_TOPICS = 20
+
+# Mastery only changes when progress is written, which invalidates the entry;
+# the TTL bounds staleness from writers that do not
+PERFORMANCE_CACHE_TTL = 120
+
+# Sessions kept in session_memory; an idle session is rebuilt from MemMachine/Neo4j on its next message
+SESSION_MEMORY_MAX_SESSIONS = 1024
+SESSION_MEMORY_TTL = 1800
+# Concurrent Gemini calls when generating plans for a whole class
+BULK_LESSON_PLAN_CONCURRENCY = 8
+# Maximum user ids per in_() filter, keeping PostgREST request URLs well under server limits
+STUDENT_ID_BATCH_SIZE = 500
+# List views skip the large plan_data and performance_snapshot JSON columns
+LESSON_PLAN_LIST_COLUMNS = "id, subject, plan_name, start_date, end_date, is_active, created_at"
+# Structured output: Gemini returns bare JSON instead of prose or markdown fences
+JSON_RESPONSE_CONFIG = {"response_mime_type": "application/json"}
+
+# Display names change rarely; a stale name in a greeting is harmless
+PROFILE_CACHE_TTL = 3600
+
+# Learning patterns and graph statistics move over minutes, not per message
+LEARNING_PATTERNS_CACHE_TTL = 30
+GRAPH_STATISTICS_CACHE_TTL = 120
+CONCEPT_RELATIONSHIPS_CACHE_TTL = 60
+
+# The interactive component library is fixed at startup; rebuild the subject index now and then anyway
+COMPONENT_INDEX_TTL = 60
+
+# Tutor replies reused for a repeat of the same message by the same student.
+# Replies that read the student's progress or learning path follow
+# PERFORMANCE_CACHE_TTL. Intents that depend on the conversation so far, on
+# session memory, or that write data (lesson plans) are not cached.
+RESPONSE_CACHE_TTLS = {
+    "knowledge_exploration": PERFORMANCE_CACHE_TTL,
+    "interactive_request": 600,
+    "personalized_request": PERFORMANCE_CACHE_TTL,
+    "weakness_improvement": PERFORMANCE_CACHE_TTL,
+}
+
+
+_gemini_model = None
+_gemini_init_attempted = False
+
+
+def _get_gemini_model():
+    """Configure Gemini and build the GenerativeModel once per process.
+    
+    Returns None when Gemini is unavailable, so callers fall back to canned responses.
+    """
+    global _gemini_model, _gemini_init_attempted
+    if _gemini_init_attempted:
+        return _gemini_model
+    _gemini_init_attempted = True
+    
+    if GEMINI_AVAILABLE and hasattr(settings, 'gemini_api_key') and settings.gemini_api_key:
+        try:
+            configure_gemini()
+            _gemini_model = genai.GenerativeModel(settings.gemini_model)
+        except Exception as e:
+            print(f"Gemini initialization failed: {e}")
+            _gemini_model = None
+    return _gemini_model
+
+
+# Upper bound on the conversation history sent to Gemini with each prompt
+CONTEXT_MAX_BYTES = 2048
+
+
+def _conversation_lines(
+    messages: List[Dict[str, Any]],
+    max_message_chars: Optional[int] = None,
+    max_bytes: int = CONTEXT_MAX_BYTES
+) -> List[str]:
+    """Format messages as "Student: ..." lines, keeping the newest that fit in max_bytes"""
+    lines = []
+    total = 0
+    for msg in reversed(messages):
+        text = msg['content']
+        if max_message_chars is not None:
+            text = f"{text[:max_message_chars]}..."
+        line = f"{'Student' if msg['role'] == 'student' else 'AI Tutor'}: {text}"
+        size = len(line.encode()) + 1
+        if total + size > max_bytes:
+            break
+        lines.append(line)
+        total += size
+    lines.reverse()
+    return lines
+
+
+def _history_context(entry) -> Dict[str, Any]:
+    """Learning context stored with a MemMachine history entry ({} if none)"""
+    content = entry.content
+    return (content.get('context') if isinstance(content, dict) else None) or {}
+
+
+def _format_activity_time(ts: datetime) -> str:
+    """YYYY-MM-DD HH:MM without going through strftime"""
+    return f"{ts.year:04d}-{ts.month:02d}-{ts.day:02d} {ts.hour:02d}:{ts.minute:02d}"
+
 
 class EnhancedAITutorService:
     """Enhanced AI Tutor with conversational interface, persistent memory, and connected reasoning"""
@@ -34,28 +291,109 @@ class EnhancedAITutorService:
     def __init__(self, supabase_client: Client):
         self.supabase = supabase_client
         
-        # Initialize Gemini if available
-        if GEMINI_AVAILABLE and hasattr(settings, 'gemini_api_key') and settings.gemini_api_key:
-            try:
-                genai.configure(api_key=settings.gemini_api_key)
-                self.model = genai.GenerativeModel('gemini-2.5-flash')
-                self.gemini_enabled = True
-            except Exception as e:
-                print(f"Gemini initialization failed: {e}")
-                self.model = None
-                self.gemini_enabled = False
-        else:
-            self.model = None
-            self.gemini_enabled = False
+        # Gemini model is shared process-wide
+        self.model = _get_gemini_model()
+        self.gemini_enabled = self.model is not None
         
         # Initialize MemMachine and Neo4j services for enhanced intelligence
         self.memmachine = get_memmachine_service()
         self.neo4j = get_neo4j_service()
         self.interactive_service = get_interactive_learning_service()
         
-        # Session memory cache for real-time interactions
-        self.session_memory = {}
-        self.conversation_context = {}
+        # Session memory cache for real-time interactions; bounded so idle sessions
+        # are evicted from long-lived workers
+        self.session_memory = BoundedTTLDict(maxsize=SESSION_MEMORY_MAX_SESSIONS, ttl=SESSION_MEMORY_TTL)
+        self.conversation_context = BoundedTTLDict(maxsize=SESSION_MEMORY_MAX_SESSIONS, ttl=SESSION_MEMORY_TTL)
+        
+        # Strong references to fire-and-forget writes so they are not garbage collected mid-flight
+        self._background_tasks = set()
+        
+        # Interactive components grouped by subject, with lowercased match keywords (built on first use)
+        self._component_index: Dict[str, List[Dict[str, Any]]] = {}
+        self._component_index_built_at: Optional[float] = None
+        
+        # Intent -> handler, all called as (content, user_id, subject, context, performance, memory)
+        self._intent_handlers = {
+            "interactive_request": lambda c, u, s, ctx, perf, mem: self._handle_interactive_request(c, u, s, perf),
+            "knowledge_exploration": lambda c, u, s, ctx, perf, mem: self._handle_knowledge_exploration(c, u, s, perf),
+            "memory_query": lambda c, u, s, ctx, perf, mem: self._handle_memory_query(c, u, mem),
+            "personalized_request": lambda c, u, s, ctx, perf, mem: self._handle_personalized_request(c, u, s, perf),
+            "weakness_improvement": lambda c, u, s, ctx, perf, mem: self._handle_weakness_improvement(c, u, s, perf),
+            "greeting": self._handle_greeting_enhanced,
+            "question": lambda c, u, s, ctx, perf, mem: self._handle_question_enhanced(c, u, s, ctx, perf),
+            "homework_help": lambda c, u, s, ctx, perf, mem: self._handle_homework_help_enhanced(c, u, s, ctx, perf),
+            "lesson_plan_request": lambda c, u, s, ctx, perf, mem: self._handle_lesson_plan_request_enhanced(c, u, s, perf),
+        }
+        self._default_intent_handler = lambda c, u, s, ctx, perf, mem: self._handle_general_message_enhanced(c, u, s, ctx, perf)
+    
+    async def _execute(self, query):
+        """Run a supabase-py query on a worker thread so the event loop keeps serving other sessions"""
+        return await asyncio.to_thread(query.execute)
+    
+    def _spawn_background(self, coro, description: str):
+        """Run a non-critical write without waiting for it, logging instead of raising on failure"""
+        task = asyncio.create_task(self._run_logged(coro, description))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _run_logged(self, coro, description: str):
+        try:
+            await coro
+        except Exception as e:
+            print(f"Background task failed ({description}): {e}")
+    
+    async def _cached_generate(
+        self,
+        prompt: str,
+        ttl: int,
+        stream: bool = False,
+        generation_config: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Generate text with Gemini, reusing the cached response for an identical prompt.
+        
+        With stream=True and a streaming caller (see stream_message), chunks are
+        forwarded to the caller as Gemini produces them.
+        """
+        sink = token_sink.get() if stream else None
+        config_part = json.dumps(generation_config, sort_keys=True) if generation_config else ""
+        cache_key = "gemini:" + hashlib.sha256(f"{self.model.model_name}{config_part}{prompt}".encode()).hexdigest()
+        cached = await cache_service.get(cache_key)
+        if cached is not None:
+            if sink is not None:
+                sink.put_nowait(cached)
+            return cached
+        
+        response = await generate_content_async(
+            self.model,
+            prompt,
+            stream_to_sink=stream,
+            generation_config=generation_config
+        )
+        text = response.text
+        await cache_service.set(cache_key, text, ttl)
+        return text
+    
+    async def _generate_json(
+        self,
+        prompt: str,
+        ttl: int,
+        generation_config: Optional[Dict[str, Any]] = JSON_RESPONSE_CONFIG
+    ) -> Optional[Dict[str, Any]]:
+        """Generate a JSON object with Gemini, caching the parsed object by prompt.
+        
+        Returns None if the model output does not contain a decodable object.
+        """
+        config_part = json.dumps(generation_config, sort_keys=True) if generation_config else ""
+        cache_key = "gemini_json:" + hashlib.sha256(f"{self.model.model_name}{config_part}{prompt}".encode()).hexdigest()
+        cached = await cache_service.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        response = await generate_content_async(self.model, prompt, generation_config=generation_config)
+        data = extract_json_object(response.text)
+        if data is not None:
+            await cache_service.set(cache_key, data, ttl)
+        return data
     
     async def create_session(
         self,
@@ -65,29 +403,32 @@ class EnhancedAITutorService:
     ) -> Dict[str, Any]:
         """Create a new AI tutor session with MemMachine integration"""
         try:
+            # One clock read for the session name, timestamps and memory entry
+            now = datetime.utcnow()
             if not session_name:
-                session_name = f"Session {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-            
-            # Get user's learning history from MemMachine
-            learning_history = await self.memmachine.get_user_learning_history(
-                user_id=user_id,
-                subject=subject.value if subject else None,
-                days_back=30,
-                limit=10
+                session_name = f"Session {now.strftime('%Y-%m-%d %H:%M')}"
+            
+            # Learning history (MemMachine) and knowledge graph progress (Neo4j) are
+            # independent backends; fetch them concurrently
+            learning_history, (user_stats, knowledge_gaps) = await asyncio.gather(
+                self.memmachine.get_user_learning_history(
+                    user_id=user_id,
+                    subject=subject.value if subject else None,
+                    days_back=30,
+                    limit=10
+                ),
+                self.neo4j.get_user_stats_and_gaps(user_id)
             )
             
-            # Get user's knowledge graph progress
-            user_stats = await self.neo4j.get_user_learning_stats(user_id)
-            knowledge_gaps = await self.neo4j.analyze_knowledge_gaps(user_id)
-            
             # Create enhanced session data
+            started_at = now.isoformat()
             session_data = {
                 "user_id": user_id,
                 "session_name": session_name,
                 "subject": subject.value if subject else None,
                 "is_active": True,
-                "started_at": datetime.utcnow().isoformat(),
-                "last_message_at": datetime.utcnow().isoformat(),
+                "started_at": started_at,
+                "last_message_at": started_at,
                 "metadata": {
                     "learning_history_count": len(learning_history),
                     "user_stats": user_stats,
@@ -97,7 +438,7 @@ class EnhancedAITutorService:
                 }
             }
             
-            result = self.supabase.table("ai_tutor_sessions").insert(session_data).execute()
+            result = await self._execute(self.supabase.table("ai_tutor_sessions").insert(session_data))
             
             if not result.data:
                 raise APIException(
@@ -121,8 +462,8 @@ class EnhancedAITutorService:
                 current_progress={"session_started": True}
             )
             
-            # Store session initialization in MemMachine
-            await self.memmachine.store_learning_session(session_context, {
+            # Session initialization record for MemMachine, stored alongside the welcome message below
+            session_record = {
                 "session_type": "ai_tutoring",
                 "session_name": session_name,
                 "initialization_data": {
@@ -135,7 +476,7 @@ class EnhancedAITutorService:
                     "session_created": True,
                     "engagement_score": 1.0
                 }
-            })
+            }
             
             # Cache session context for quick access
             self.session_memory[session_id] = {
@@ -145,7 +486,8 @@ class EnhancedAITutorService:
                 "user_stats": user_stats,
                 "knowledge_gaps": knowledge_gaps,
                 "session_context": session_context,
-                "created_at": datetime.now()
+                "created_at": now,
+                "message_count": 1  # The welcome message inserted below
             }
             
             # Generate personalized welcome message based on user's history
@@ -167,7 +509,13 @@ class EnhancedAITutorService:
                 }
             }
             
-            self.supabase.table("ai_tutor_messages").insert(welcome_message).execute()
+            # Build the insert before creating the MemMachine coroutine so a failure
+            # here cannot leave that coroutine un-awaited
+            welcome_insert = self.supabase.table("ai_tutor_messages").insert(welcome_message)
+            await asyncio.gather(
+                self.memmachine.store_learning_session(session_context, session_record),
+                self._execute(welcome_insert)
+            )
             
             return session
             
@@ -188,6 +536,13 @@ class EnhancedAITutorService:
     ) -> str:
         """Generate a personalized welcome message based on user's learning data"""
         try:
+            subject_text = f" in {subject.value}" if subject else ""
+            weak_areas = knowledge_gaps.get('weak_areas', [])
+            
+            # New students have no history to mention; skip straight to the canned welcome
+            if not learning_history and not weak_areas and not user_stats.get('mastered_concepts', 0) > 0:
+                return f"Hello! I'm excited to start learning with you. {_WELCOME_INTRO.format(subject_text=subject_text)}{_WELCOME_FEATURES}{_WELCOME_CLOSING}"
+            
             # Build context from user's data
             context_parts = []
             
@@ -196,8 +551,8 @@ class EnhancedAITutorService:
                 context_parts.append(f"I see you've had {recent_sessions} recent learning sessions")
                 
                 # Get most recent subject
-                if learning_history[0].content.get('context', {}).get('subject'):
-                    recent_subject = learning_history[0].content['context']['subject']
+                recent_subject = _history_context(learning_history[0]).get('subject')
+                if recent_subject:
                     context_parts.append(f"with recent focus on {recent_subject}")
             
             if user_stats.get('mastered_concepts', 0) > 0:
@@ -205,37 +560,21 @@ class EnhancedAITutorService:
                 total = user_stats.get('total_concepts', mastered)
                 context_parts.append(f"You've mastered {mastered} out of {total} concepts")
             
-            weak_areas = knowledge_gaps.get('weak_areas', [])
             if weak_areas:
                 weak_count = len(weak_areas)
                 context_parts.append(f"I notice {weak_count} areas where we can focus on improvement")
             
             # Generate personalized message
             if context_parts:
-                context_text = ". ".join(context_parts)
-                welcome_msg = f"Welcome back! {context_text}. "
+                greeting = f"Welcome back! {'. '.join(context_parts)}. "
             else:
-                welcome_msg = "Hello! I'm excited to start learning with you. "
-            
-            subject_text = f" in {subject.value}" if subject else ""
-            
-            welcome_msg += f"I'm your AI tutor with advanced memory and knowledge mapping capabilities{subject_text}. "
-            welcome_msg += "I remember our previous conversations and can track your progress across all topics. "
-            
-            # Add interactive features mention
-            welcome_msg += "\n\n🎯 **What I can help you with:**\n"
-            welcome_msg += "• **Smart Q&A**: Ask me anything and I'll remember the context\n"
-            welcome_msg += "• **Interactive Learning**: Access visual simulations and practice tools\n"
-            welcome_msg += "• **Personalized Paths**: Get learning routes based on your progress\n"
-            welcome_msg += "• **Knowledge Mapping**: See how concepts connect to each other\n"
-            welcome_msg += "• **Memory Insights**: Track your learning patterns over time\n"
+                greeting = "Hello! I'm excited to start learning with you. "
             
+            focus = ""
             if weak_areas:
-                welcome_msg += f"\n💡 **Focus Suggestion**: I recommend we work on {weak_areas[0].get('concept', 'key concepts')} to strengthen your foundation."
-            
-            welcome_msg += "\n\nWhat would you like to explore today?"
+                focus = f"\n💡 **Focus Suggestion**: I recommend we work on {weak_areas[0].get('concept', 'key concepts')} to strengthen your foundation."
             
-            return welcome_msg
+            return f"{greeting}{_WELCOME_INTRO.format(subject_text=subject_text)}{_WELCOME_FEATURES}{focus}{_WELCOME_CLOSING}"
             
         except Exception as e:
             # Fallback welcome message
@@ -250,13 +589,13 @@ class EnhancedAITutorService:
     ) -> List[Dict[str, Any]]:
         """Get all sessions for a user"""
         try:
-            result = self.supabase.table("ai_tutor_sessions")\
+            query = self.supabase.table("ai_tutor_sessions")\
                 .select("*")\
                 .eq("user_id", user_id)\
                 .order("last_message_at", desc=True)\
                 .limit(limit)\
-                .offset(offset)\
-                .execute()
+                .offset(offset)
+            result = await self._execute(query)
             
             return result.data or []
             
@@ -283,12 +622,12 @@ class EnhancedAITutorService:
     ) -> List[Dict[str, Any]]:
         """Get all messages in a session"""
         try:
-            result = self.supabase.table("ai_tutor_messages")\
+            query = self.supabase.table("ai_tutor_messages")\
                 .select("*")\
                 .eq("session_id", session_id)\
                 .order("created_at", desc=False)\
-                .limit(limit)\
-                .execute()
+                .limit(limit)
+            result = await self._execute(query)
             
             return result.data or []
             
@@ -308,13 +647,18 @@ class EnhancedAITutorService:
         message_type: str = "text"
     ) -> Dict[str, Any]:
         """Send a message in a session and get enhanced AI response with memory and knowledge graph integration"""
+        rag_response_task = None
+        unsaved_user_message = None
         try:
+            # Stamp the student's message on arrival; it is saved together with the AI reply
+            received_at = datetime.utcnow().isoformat()
+            
             # Get session info
-            session_result = self.supabase.table("ai_tutor_sessions")\
+            session_query = self.supabase.table("ai_tutor_sessions")\
                 .select("*")\
                 .eq("id", session_id)\
-                .eq("user_id", user_id)\
-                .execute()
+                .eq("user_id", user_id)
+            session_result = await self._execute(session_query)
             
             if not session_result.data:
                 raise APIException(
@@ -324,62 +668,78 @@ class EnhancedAITutorService:
                 )
             
             session = session_result.data[0]
+            # Resolve the subject once: the enum drives performance lookups and responses,
+            # the raw value is what gets stored with messages
+            resolved_subject = subject or (Subject(session.get("subject")) if session.get("subject") else Subject.MATHEMATICS)
+            message_subject = subject.value if subject else session.get("subject")
             
-            # Get or initialize session memory
+            # Session memory, message analysis, conversation context and
+            # performance data are independent; run them concurrently so their round trips overlap
             if session_id not in self.session_memory:
-                await self._initialize_session_memory(session_id, user_id, subject)
+                session_memory_init = self._initialize_session_memory(session_id, user_id, subject)
+            else:
+                session_memory_init = asyncio.sleep(0)
             
+            # Lowercase and tokenize the message once for analysis and intent classification
+            content_lower = content.lower().strip()
+            words = frozenset(_WORD_RE.findall(content_lower))
+            
+            # A message that can only be a question goes to RAG whatever the reads below
+            # return; start that lookup now so it overlaps them
+            if self._is_plain_question(content_lower, words):
+                rag_response_task = asyncio.create_task(self._query_rag(content, resolved_subject))
+            
+            _, message_analysis, conversation_context, performance_data = await asyncio.gather(
+                session_memory_init,
+                self._analyze_message_for_learning(content, words, user_id, subject),
+                self._get_enhanced_conversation_context(session_id, user_id),
+                self._get_enhanced_performance_data(user_id, resolved_subject)
+            )
             session_memory = self.session_memory[session_id]
             
             # Store user message in MemMachine for persistent memory
             message_context = LearningContext(
                 user_id=user_id,
                 session_id=session_id,
-                subject=subject.value if subject else session.get("subject", "general"),
+                subject=message_subject or "general",
                 topic="conversation",
                 difficulty_level=1,
                 learning_objectives=["interactive_conversation"],
                 previous_knowledge=session_memory.get("user_stats", {}),
-                current_progress={"message_count": len(await self.get_session_messages(session_id, limit=100))}
+                current_progress={"message_count": session_memory.get("message_count", 0)}
             )
             
-            # Analyze message for learning insights
-            message_analysis = await self._analyze_message_for_learning(content, user_id, subject)
-            
-            await self.memmachine.store_learning_session(message_context, {
+            # MemMachine and knowledge graph writes are not needed for the reply; run them
+            # in the background so they stay off the response path
+            self._spawn_background(self.memmachine.store_learning_session(message_context, {
                 "message_type": "user_input",
                 "content": content,
                 "message_analysis": message_analysis,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": received_at,
                 "performance_metrics": {
                     "engagement_score": message_analysis.get("engagement_score", 0.8),
                     "complexity_level": message_analysis.get("complexity_level", 1)
                 }
-            })
+            }), "store user message in MemMachine")
             
-            # Save user message to database
+            # User message is written together with the AI reply below; received_at keeps
+            # created_at ordering reflecting when it arrived
             user_message = {
                 "session_id": session_id,
                 "role": "student",
                 "content": content,
                 "message_type": message_type,
-                "subject": subject.value if subject else session.get("subject"),
+                "subject": message_subject,
+                "created_at": received_at,
                 "metadata": {
                     "analysis": message_analysis,
                     "memory_stored": True
                 }
             }
-            
-            user_msg_result = self.supabase.table("ai_tutor_messages").insert(user_message).execute()
-            
-            # Get enhanced conversation context from MemMachine
-            conversation_context = await self._get_enhanced_conversation_context(session_id, user_id)
-            
-            # Get real-time performance data and knowledge graph insights
-            performance_data = await self._get_enhanced_performance_data(user_id, subject or (Subject(session.get("subject")) if session.get("subject") else Subject.MATHEMATICS))
+            unsaved_user_message = user_message
             
             # Determine message intent with enhanced classification
-            intent = await self._classify_intent_enhanced(content, conversation_context, performance_data)
+            intent = await self._classify_intent_enhanced(content_lower, words, conversation_context, performance_data)
             
             # Generate AI response with full intelligence integration
             ai_response = await self._generate_enhanced_response(
@@ -387,37 +747,56 @@ class EnhancedAITutorService:
                 intent=intent,
                 user_id=user_id,
                 session_id=session_id,
-                subject=subject or (Subject(session.get("subject")) if session.get("subject") else Subject.MATHEMATICS),
+                subject=resolved_subject,
                 conversation_context=conversation_context,
                 performance_data=performance_data,
-                session_memory=session_memory
+                session_memory=session_memory,
+                rag_response_task=rag_response_task
             )
             
+            # Reply timestamp shared by the MemMachine entry, the saved message and the session
+            replied = datetime.utcnow()
+            replied_at = replied.isoformat()
+            
+            # Handlers build a fresh metadata dict per reply, so tag it in place; the
+            # MemMachine entry and the saved message share it
+            concepts_discussed = ai_response.get("concepts_discussed", [])
+            response_metadata = ai_response.get("metadata") or {}
+            response_metadata.update({
+                "enhanced_intelligence": True,
+                "memory_integration": True,
+                "knowledge_graph_updated": len(concepts_discussed) > 0
+            })
+            
             # Store AI response in MemMachine
-            await self.memmachine.store_learning_session(message_context, {
+            self._spawn_background(self.memmachine.store_learning_session(message_context, {
                 "message_type": "ai_response",
                 "content": ai_response["content"],
                 "intent": intent,
-                "response_metadata": ai_response.get("metadata", {}),
-                "timestamp": datetime.now().isoformat(),
+                "response_metadata": response_metadata,
+                "timestamp": replied_at,
                 "performance_metrics": {
                     "response_quality": ai_response.get("quality_score", 0.9),
                     "helpfulness": ai_response.get("helpfulness_score", 0.8)
                 }
-            })
+            }), "store AI response in MemMachine")
             
             # Update knowledge graph with interaction data
-            if intent in ["question", "homework_help"] and ai_response.get("concepts_discussed"):
-                for concept in ai_response["concepts_discussed"]:
-                    await self.neo4j.update_user_progress(
-                        user_id=user_id,
-                        concept_name=concept,
-                        performance_data={
-                            "accuracy": ai_response.get("understanding_level", 0.7),
-                            "engagement_score": message_analysis.get("engagement_score", 0.8),
+            if intent in ["question", "homework_help"] and concepts_discussed:
+                accuracy = ai_response.get("understanding_level", 0.7)
+                engagement_score = message_analysis.get("engagement_score", 0.8)
+                self._spawn_background(self.neo4j.batch_update_user_progress(
+                    user_id=user_id,
+                    updates=[
+                        {
+                            "concept": concept,
+                            "accuracy": accuracy,
+                            "engagement_score": engagement_score,
                             "duration": 300  # Estimated 5 minutes per interaction
                         }
-                    )
+                        for concept in concepts_discussed
+                    ]
+                ), "update knowledge graph progress")
             
             # Save enhanced AI response
             ai_message = {
@@ -425,75 +804,129 @@ class EnhancedAITutorService:
                 "role": "assistant",
                 "content": ai_response["content"],
                 "message_type": ai_response.get("message_type", "text"),
-                "subject": subject.value if subject else session.get("subject"),
-                "metadata": {
-                    **ai_response.get("metadata", {}),
-                    "enhanced_intelligence": True,
-                    "memory_integration": True,
-                    "knowledge_graph_updated": len(ai_response.get("concepts_discussed", [])) > 0
-                }
+                "subject": message_subject,
+                "created_at": replied_at,
+                "metadata": response_metadata
             }
             
-            ai_msg_result = self.supabase.table("ai_tutor_messages").insert(ai_message).execute()
+            # Save both turns in one round trip; rows come back in insert order
+            messages_insert = self.supabase.table("ai_tutor_messages").insert([user_message, ai_message])
             
-            # Update session with enhanced metadata
-            self.supabase.table("ai_tutor_sessions")\
+            # Update session with enhanced metadata; the session row was fetched for this
+            # request, so its metadata can be updated in place
+            session_metadata = session.get("metadata") or {}
+            session_metadata.update({
+                "total_interactions": session_metadata.get("total_interactions", 0) + 1,
+                "last_intent": intent,
+                "concepts_discussed": concepts_discussed
+            })
+            session_update = self.supabase.table("ai_tutor_sessions")\
                 .update({
-                    "last_message_at": datetime.utcnow().isoformat(),
-                    "metadata": {
-                        **session.get("metadata", {}),
-                        "total_interactions": session.get("metadata", {}).get("total_interactions", 0) + 1,
-                        "last_intent": intent,
-                        "concepts_discussed": ai_response.get("concepts_discussed", [])
-                    }
+                    "last_message_at": replied_at,
+                    "metadata": session_metadata
                 })\
-                .eq("id", session_id)\
-                .execute()
+                .eq("id", session_id)
+            
+            # Collect both outcomes so a failed session update is not mistaken for unsaved messages
+            messages_result, session_update_result = await asyncio.gather(
+                self._execute(messages_insert),
+                self._execute(session_update),
+                return_exceptions=True
+            )
+            if isinstance(messages_result, BaseException):
+                raise messages_result
+            unsaved_user_message = None
+            if isinstance(session_update_result, BaseException):
+                raise session_update_result
+            saved_messages = messages_result.data or []
             
             # Update session memory cache
-            self.session_memory[session_id]["last_interaction"] = {
-                "timestamp": datetime.now(),
+            session_memory["message_count"] = session_memory.get("message_count", 0) + 2
+            session_memory["last_interaction"] = {
+                "timestamp": replied,
                 "intent": intent,
-                "concepts": ai_response.get("concepts_discussed", []),
+                "concepts": concepts_discussed,
                 "user_message": content,
                 "ai_response": ai_response["content"]
             }
             
             return {
-                "user_message": user_msg_result.data[0] if user_msg_result.data else None,
-                "ai_message": ai_msg_result.data[0] if ai_msg_result.data else None,
+                "user_message": saved_messages[0] if len(saved_messages) > 0 else None,
+                "ai_message": saved_messages[1] if len(saved_messages) > 1 else None,
                 "session_id": session_id,
                 "enhanced_features": {
                     "memory_integration": True,
-                    "knowledge_graph_updated": len(ai_response.get("concepts_discussed", [])) > 0,
+                    "knowledge_graph_updated": len(concepts_discussed) > 0,
                     "intent_detected": intent,
-                    "concepts_discussed": ai_response.get("concepts_discussed", []),
+                    "concepts_discussed": concepts_discussed,
                     "interactive_components_suggested": ai_response.get("interactive_suggestions", [])
                 }
             }
             
         except Exception as e:
+            # Do not leave a prefetched RAG lookup running for a failed request
+            if rag_response_task is not None and not rag_response_task.done():
+                rag_response_task.cancel()
+            # The reply failed, but the student's message must not be lost
+            if unsaved_user_message is not None:
+                try:
+                    await self._execute(self.supabase.table("ai_tutor_messages").insert(unsaved_user_message))
+                except Exception as save_error:
+                    print(f"Error saving user message after failed reply: {save_error}")
             raise APIException(
                 code="SEND_MESSAGE_ERROR",
                 message=f"Error sending message: {str(e)}",
                 status_code=500
             )
     
+    async def stream_message(
+        self,
+        session_id: str,
+        user_id: str,
+        content: str,
+        subject: Optional[Subject] = None,
+        message_type: str = "text"
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Run send_message, yielding ("token", text) while the reply is generated and
+        finally ("result", send_message's return value)"""
+        queue: asyncio.Queue = asyncio.Queue()
+        sink_token = token_sink.set(queue)
+        try:
+            # The task copies the current context, so it sees the sink
+            turn = asyncio.create_task(self.send_message(session_id, user_id, content, subject, message_type))
+        finally:
+            token_sink.reset(sink_token)
+        
+        while True:
+            next_chunk = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({next_chunk, turn}, return_when=asyncio.FIRST_COMPLETED)
+            if next_chunk in done:
+                yield "token", next_chunk.result()
+                continue
+            next_chunk.cancel()
+            break
+        
+        while not queue.empty():
+            yield "token", queue.get_nowait()
+        
+        yield "result", turn.result()
+    
     async def _initialize_session_memory(self, session_id: str, user_id: str, subject: Optional[Subject]):
         """Initialize session memory if not already cached"""
         try:
-            # Get user's learning history from MemMachine
-            learning_history = await self.memmachine.get_user_learning_history(
-                user_id=user_id,
-                subject=subject.value if subject else None,
-                days_back=30,
-                limit=10
+            # Learning history (MemMachine) and knowledge graph progress (Neo4j) are
+            # independent backends; fetch them concurrently
+            learning_history, (user_stats, knowledge_gaps), message_count = await asyncio.gather(
+                self.memmachine.get_user_learning_history(
+                    user_id=user_id,
+                    subject=subject.value if subject else None,
+                    days_back=30,
+                    limit=10
+                ),
+                self.neo4j.get_user_stats_and_gaps(user_id),
+                self._count_session_messages(session_id)
             )
             
-            # Get user's knowledge graph progress
-            user_stats = await self.neo4j.get_user_learning_stats(user_id)
-            knowledge_gaps = await self.neo4j.analyze_knowledge_gaps(user_id)
-            
             self.session_memory[session_id] = {
                 "user_id": user_id,
                 "subject": subject.value if subject else None,
@@ -501,7 +934,8 @@ class EnhancedAITutorService:
                 "user_stats": user_stats,
                 "knowledge_gaps": knowledge_gaps,
                 "created_at": datetime.now(),
-                "last_interaction": None
+                "last_interaction": None,
+                "message_count": message_count
             }
             
         except Exception as e:
@@ -513,25 +947,45 @@ class EnhancedAITutorService:
                 "user_stats": {},
                 "knowledge_gaps": {},
                 "created_at": datetime.now(),
+                "message_count": 0,
                 "error": str(e)
             }
     
-    async def _analyze_message_for_learning(self, content: str, user_id: str, subject: Optional[Subject]) -> Dict[str, Any]:
-        """Analyze user message for learning insights"""
+    async def _count_session_messages(self, session_id: str) -> int:
+        """Count a session's stored messages; seeds the in-memory counter when a session is resumed"""
+        try:
+            query = self.supabase.table("ai_tutor_messages")\
+                .select("id", count="exact")\
+                .eq("session_id", session_id)\
+                .limit(1)
+            result = await self._execute(query)
+            return result.count or 0
+        except Exception as e:
+            print(f"Error counting session messages: {e}")
+            return 0
+    
+    async def _analyze_message_for_learning(
+        self,
+        content: str,
+        words: AbstractSet[str],
+        user_id: str,
+        subject: Optional[Subject]
+    ) -> Dict[str, Any]:
+        """Analyze user message for learning insights; words is the message's lowercased word set"""
         try:
             analysis = {
                 "message_length": len(content),
-                "word_count": len(content.split()),
-                "question_indicators": ["?", "what", "how", "why", "explain"] 
+                "word_count": len(content.split())
             }
             
+            # Every check below is a set lookup against the pre-tokenized words
             # Calculate engagement score based on message characteristics
             engagement_score = 0.5  # Base score
             
             if analysis["word_count"] > 10:
                 engagement_score += 0.2  # Detailed messages show engagement
             
-            if any(indicator in content.lower() for indicator in analysis["question_indicators"]):
+            if "?" in content or not words.isdisjoint(_QUESTION_WORDS):
                 engagement_score += 0.2  # Questions show active learning
                 analysis["contains_question"] = True
             
@@ -539,8 +993,7 @@ class EnhancedAITutorService:
                 engagement_score += 0.1  # Longer messages show thoughtfulness
             
             # Detect complexity level
-            complexity_indicators = ["because", "however", "therefore", "although", "moreover"]
-            if any(indicator in content.lower() for indicator in complexity_indicators):
+            if not words.isdisjoint(_COMPLEXITY_WORDS):
                 analysis["complexity_level"] = 2
                 engagement_score += 0.1
             else:
@@ -550,14 +1003,8 @@ class EnhancedAITutorService:
             
             # Detect subject-specific keywords
             if subject:
-                subject_keywords = {
-                    "mathematics": ["equation", "solve", "calculate", "formula", "graph"],
-                    "physics": ["force", "energy", "motion", "velocity", "acceleration"],
-                    "chemistry": ["reaction", "molecule", "element", "compound", "bond"]
-                }
-                
-                keywords = subject_keywords.get(subject.value.lower(), [])
-                found_keywords = [kw for kw in keywords if kw in content.lower()]
+                keywords = _SUBJECT_KEYWORDS.get(subject.value.lower(), ())
+                found_keywords = [kw for kw in keywords if kw in words]
                 analysis["subject_keywords"] = found_keywords
                 
                 if found_keywords:
@@ -573,24 +1020,40 @@ class EnhancedAITutorService:
                 "complexity_level": 1
             }
     
+    async def _get_recent_messages(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Get the newest messages in a session (role and content only), oldest first"""
+        query = self.supabase.table("ai_tutor_messages")\
+            .select("role, content")\
+            .eq("session_id", session_id)\
+            .order("created_at", desc=True)\
+            .limit(limit)
+        result = await self._execute(query)
+        return list(reversed(result.data or []))
+    
     async def _get_enhanced_conversation_context(self, session_id: str, user_id: str) -> str:
         """Get enhanced conversation context using MemMachine data"""
+        # Recent messages are the only ai_tutor_messages read for the turn; fetch them
+        # once alongside the MemMachine patterns and let each fail on its own
+        recent_messages, learning_patterns = await asyncio.gather(
+            self._get_recent_messages(session_id, limit=5),
+            self.memmachine.analyze_learning_patterns(user_id),
+            return_exceptions=True
+        )
+        if isinstance(recent_messages, Exception):
+            print(f"Error fetching recent messages: {recent_messages}")
+            recent_messages = []
+        if isinstance(learning_patterns, Exception):
+            print(f"Error analyzing learning patterns: {learning_patterns}")
+            learning_patterns = None
+        
         try:
-            # Get recent messages from database
-            recent_messages = await self.get_session_messages(session_id, limit=10)
-            
-            # Get broader learning context from MemMachine
-            learning_patterns = await self.memmachine.analyze_learning_patterns(user_id)
-            
             # Build enhanced context
             context_parts = []
             
             # Add recent conversation
             if recent_messages:
                 context_parts.append("Recent conversation:")
-                for msg in recent_messages[-5:]:
-                    role = "Student" if msg['role'] == 'student' else "AI Tutor"
-                    context_parts.append(f"{role}: {msg['content'][:100]}...")
+                context_parts.extend(_conversation_lines(recent_messages, max_message_chars=100))
             
             # Add learning patterns insight
             if learning_patterns and not learning_patterns.get('error'):
@@ -608,12 +1071,8 @@ class EnhancedAITutorService:
             return "\n".join(context_parts)
             
         except Exception as e:
-            # Fallback to basic context
-            recent_messages = await self.get_session_messages(session_id, limit=5)
-            return "\n".join([
-                f"{'Student' if msg['role'] == 'student' else 'AI Tutor'}: {msg['content']}"
-                for msg in recent_messages[-3:]
-            ])
+            # Fallback to basic context from whatever messages were fetched
+            return "\n".join(_conversation_lines(recent_messages[-3:]))
     
     async def _get_enhanced_performance_data(self, user_id: str, subject: Subject) -> Dict[str, Any]:
         """Get enhanced performance data combining traditional and knowledge graph data"""
@@ -622,8 +1081,7 @@ class EnhancedAITutorService:
             traditional_data = await self._get_student_performance(user_id, subject)
             
             # Get knowledge graph insights
-            user_stats = await self.neo4j.get_user_learning_stats(user_id)
-            knowledge_gaps = await self.neo4j.analyze_knowledge_gaps(user_id)
+            user_stats, knowledge_gaps = await self.neo4j.get_user_stats_and_gaps(user_id)
             recommendations = await self.neo4j.recommend_next_concepts(user_id, limit=5)
             
             # Combine data
@@ -645,46 +1103,34 @@ class EnhancedAITutorService:
     
     async def _classify_intent_enhanced(
         self, 
-        content: str, 
+        content_lower: str, 
+        words: AbstractSet[str], 
         conversation_context: str, 
         performance_data: Dict[str, Any]
     ) -> str:
-        """Enhanced intent classification using context and performance data"""
+        """Enhanced intent classification using context and performance data
+        
+        Takes the message already lowercased/stripped and tokenized by send_message.
+        """
         try:
-            # Start with basic classification
-            basic_intent = self._classify_intent(content)
+            # Shorter than any enhanced phrase ("demo") or the "help" of the weak-area rule
+            if len(content_lower) < 4:
+                return self._classify_intent(content_lower, words)
             
-            # Enhance based on context and performance
-            content_lower = content.lower().strip()
-            
-            # Check for interactive learning requests
-            interactive_keywords = ["show me", "visualize", "simulate", "interactive", "demo", "practice"]
-            if any(keyword in content_lower for keyword in interactive_keywords):
-                return "interactive_request"
-            
-            # Check for knowledge graph exploration
-            graph_keywords = ["how does", "connect", "relationship", "related to", "prerequisite", "depends on"]
-            if any(keyword in content_lower for keyword in graph_keywords):
-                return "knowledge_exploration"
-            
-            # Check for memory/progress queries
-            memory_keywords = ["my progress", "what did we", "remember", "last time", "history"]
-            if any(keyword in content_lower for keyword in memory_keywords):
-                return "memory_query"
-            
-            # Check for personalized learning requests
-            personal_keywords = ["for me", "my level", "personalized", "adapted", "customized"]
-            if any(keyword in content_lower for keyword in personal_keywords):
-                return "personalized_request"
+            # Interactive, knowledge graph, memory and personalized requests in one
+            # pass; when several match, the earliest bucket wins
+            intent = _match_intent_phrases(_ENHANCED_INTENT_BY_PHRASE, _ENHANCED_INTENT_RE, content_lower)
+            if intent:
+                return intent
             
             # Enhanced context-based classification
-            if "weak" in conversation_context.lower() and ("help" in content_lower or "improve" in content_lower):
+            if ("help" in content_lower or "improve" in content_lower) and "weak" in conversation_context.lower():
                 return "weakness_improvement"
             
-            return basic_intent
+            return self._classify_intent(content_lower, words)
             
         except Exception as e:
-            return self._classify_intent(content)
+            return self._classify_intent(content_lower, words)
     
     async def _generate_enhanced_response(
         self,
@@ -695,31 +1141,49 @@ class EnhancedAITutorService:
         subject: Subject,
         conversation_context: str,
         performance_data: Dict[str, Any],
-        session_memory: Dict[str, Any]
+        session_memory: Dict[str, Any],
+        rag_response_task: Optional["asyncio.Task"] = None
     ) -> Dict[str, Any]:
-        """Generate enhanced AI response with full intelligence integration"""
+        """Generate enhanced AI response with full intelligence integration
+        
+        Replies for intents in RESPONSE_CACHE_TTLS are cached per student, keyed by
+        the normalized message and performance_data, so a repeated request skips
+        the knowledge graph, MemMachine and Gemini calls behind its handler.
+        rag_response_task is a RAG lookup send_message already started for a
+        message that can only be a question.
+        """
         try:
+            if rag_response_task is not None:
+                if intent == "question":
+                    return await self._handle_question_enhanced(
+                        content, user_id, subject, conversation_context, performance_data,
+                        rag_response_task=rag_response_task
+                    )
+                rag_response_task.cancel()
+            
+            ttl = RESPONSE_CACHE_TTLS.get(intent)
+            cache_key = None
+            if ttl:
+                # Word order matters ("is A a prerequisite of B"). The performance snapshot is
+                # rebuilt once progress writes drop student_performance_key, so replies built
+                # on the old snapshot stop matching
+                signature = " ".join(_WORD_RE.findall(content.lower()))
+                snapshot = json.dumps(performance_data, sort_keys=True, default=str)
+                cache_key = f"tutor_response:{intent}:{subject.value}:{user_id}:" + \
+                    hashlib.sha256(f"{signature}\n{snapshot}".encode()).hexdigest()
+                cached = await cache_service.get(cache_key)
+                if cached is not None:
+                    # send_message tags the reply's metadata in place
+                    return copy.deepcopy(cached)
+            
             # Route to appropriate enhanced handler
-            if intent == "interactive_request":
-                return await self._handle_interactive_request(content, user_id, subject, performance_data)
-            elif intent == "knowledge_exploration":
-                return await self._handle_knowledge_exploration(content, user_id, subject, performance_data)
-            elif intent == "memory_query":
-                return await self._handle_memory_query(content, user_id, session_memory)
-            elif intent == "personalized_request":
-                return await self._handle_personalized_request(content, user_id, subject, performance_data)
-            elif intent == "weakness_improvement":
-                return await self._handle_weakness_improvement(content, user_id, subject, performance_data)
-            elif intent == "greeting":
-                return await self._handle_greeting_enhanced(content, user_id, subject, conversation_context, performance_data, session_memory)
-            elif intent == "question":
-                return await self._handle_question_enhanced(content, user_id, subject, conversation_context, performance_data)
-            elif intent == "homework_help":
-                return await self._handle_homework_help_enhanced(content, user_id, subject, conversation_context, performance_data)
-            elif intent == "lesson_plan_request":
-                return await self._handle_lesson_plan_request_enhanced(content, user_id, subject, performance_data)
-            else:
-                return await self._handle_general_message_enhanced(content, user_id, subject, conversation_context, performance_data)
+            handler = self._intent_handlers.get(intent, self._default_intent_handler)
+            response = await handler(content, user_id, subject, conversation_context, performance_data, session_memory)
+            
+            # Handler fallbacks record the failure in metadata; never cache those
+            if cache_key and "error" not in (response.get("metadata") or {}) and response.get("message_type") != "error":
+                await cache_service.set(cache_key, copy.deepcopy(response), ttl)
+            return response
                 
         except Exception as e:
             return {
@@ -739,61 +1203,34 @@ class EnhancedAITutorService:
     ) -> Dict[str, Any]:
         """Handle requests for interactive learning components"""
         try:
-            # Get available interactive components
-            component_library = await self.interactive_service.get_component_library()
+            # Get available interactive components for this subject
+            subject_components = (await self._get_component_index()).get(subject.value.lower(), [])
             
-            # Find relevant components based on subject and content
-            relevant_components = []
+            # Find relevant components based on content
             content_lower = content.lower()
-            
-            for comp_id, comp_info in component_library["library"]["components"].items():
-                if comp_info.get("subject") == subject.value.lower():
-                    # Check if component matches request
-                    if any(keyword in content_lower for keyword in [
-                        comp_info.get("topic", "").lower(),
-                        comp_info.get("title", "").lower().split()[-1]
-                    ]):
-                        relevant_components.append({
-                            "id": comp_id,
-                            "title": comp_info["title"],
-                            "type": comp_info["type"],
-                            "duration": comp_info["duration"],
-                            "difficulty": comp_info["difficulty"]
-                        })
+            relevant_components = [
+                entry["component"] for entry in subject_components
+                if any(keyword in content_lower for keyword in entry["keywords"])
+            ]
             
             if not relevant_components:
                 # Suggest general components for the subject
-                for comp_id, comp_info in component_library["library"]["components"].items():
-                    if comp_info.get("subject") == subject.value.lower():
-                        relevant_components.append({
-                            "id": comp_id,
-                            "title": comp_info["title"],
-                            "type": comp_info["type"],
-                            "duration": comp_info["duration"],
-                            "difficulty": comp_info["difficulty"]
-                        })
-                        if len(relevant_components) >= 3:
-                            break
+                relevant_components = [entry["component"] for entry in subject_components[:3]]
             
             # Generate response with interactive suggestions
-            response_content = f"🎮 **Interactive Learning Available!**\n\n"
-            response_content += f"I found {len(relevant_components)} interactive components for {subject.value}:\n\n"
+            parts = ["🎮 **Interactive Learning Available!**\n\n"]
+            parts.append(f"I found {len(relevant_components)} interactive components for {subject.value}:\n\n")
             
             for i, comp in enumerate(relevant_components[:3], 1):
-                response_content += f"**{i}. {comp['title']}**\n"
-                response_content += f"   • Type: {comp['type'].title()}\n"
-                response_content += f"   • Duration: ~{comp['duration']} minutes\n"
-                response_content += f"   • Difficulty: Level {comp['difficulty']}\n\n"
-            
-            response_content += "🚀 **To start an interactive session:**\n"
-            response_content += "1. Choose a component from above\n"
-            response_content += "2. I'll create a personalized learning session\n"
-            response_content += "3. You'll get real-time feedback and progress tracking\n\n"
+                parts.append(f"**{i}. {comp['title']}**\n")
+                parts.append(f"   • Type: {comp['type'].title()}\n")
+                parts.append(f"   • Duration: ~{comp['duration']} minutes\n")
+                parts.append(f"   • Difficulty: Level {comp['difficulty']}\n\n")
             
-            response_content += "Which interactive component interests you most?"
+            parts.append(_INTERACTIVE_START_STEPS)
             
             return {
-                "content": response_content,
+                "content": "".join(parts),
                 "message_type": "interactive_suggestion",
                 "metadata": {
                     "available_components": relevant_components,
@@ -814,6 +1251,83 @@ class EnhancedAITutorService:
                 "interactive_suggestions": []
             }
     
+    async def _get_learning_patterns(self, user_id: str) -> Dict[str, Any]:
+        """MemMachine learning patterns for a user, cached briefly"""
+        cache_key = f"learning_patterns:{user_id}"
+        cached = await cache_service.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        learning_patterns = await self.memmachine.analyze_learning_patterns(user_id)
+        # An empty history is reported as an error; re-check it next time
+        if learning_patterns and not learning_patterns.get('error'):
+            await cache_service.set(cache_key, learning_patterns, LEARNING_PATTERNS_CACHE_TTL)
+        return learning_patterns
+    
+    async def _get_graph_statistics(self) -> Dict[str, Any]:
+        """Knowledge graph statistics, cached briefly and shared by all students"""
+        cached = await cache_service.get("graph_statistics")
+        if cached is not None:
+            return cached
+        
+        graph_stats = await self.neo4j.get_graph_statistics()
+        await cache_service.set("graph_statistics", graph_stats, GRAPH_STATISTICS_CACHE_TTL)
+        return graph_stats
+    
+    async def _get_concept_relationships(self, concepts: List[str]) -> Dict[str, Dict[str, List[str]]]:
+        """Relationships for each concept, cached briefly; uncached concepts share one graph query
+        
+        Concepts missing from the graph are cached as empty so repeats do not query again.
+        """
+        cached = await asyncio.gather(*(cache_service.get(f"concept_relationships:{concept}") for concept in concepts))
+        relationships_by_concept = {
+            concept: relationships for concept, relationships in zip(concepts, cached) if relationships is not None
+        }
+        missing = [concept for concept in concepts if concept not in relationships_by_concept]
+        if missing:
+            fetched = await self.neo4j.get_concept_relationships_bulk(missing)
+            for concept in missing:
+                relationships = fetched.get(concept, {})
+                relationships_by_concept[concept] = relationships
+                await cache_service.set(f"concept_relationships:{concept}", relationships, CONCEPT_RELATIONSHIPS_CACHE_TTL)
+        return relationships_by_concept
+    
+    async def _get_component_index(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Interactive components grouped by lowercased subject
+        
+        Each entry holds the component summary used in replies and the lowercased
+        keywords (topic and last word of the title) a message is matched against.
+        """
+        now = time.monotonic()
+        if self._component_index_built_at is not None and now - self._component_index_built_at < COMPONENT_INDEX_TTL:
+            return self._component_index
+        
+        component_library = await self.interactive_service.get_component_library()
+        index: Dict[str, List[Dict[str, Any]]] = {}
+        for comp_id, comp_info in component_library["components"].items():
+            if not comp_info.get("subject"):
+                continue
+            title = comp_info.get("title") or ""
+            title_words = title.lower().split()
+            keywords = [keyword for keyword in (
+                (comp_info.get("topic") or "").lower(),
+                title_words[-1] if title_words else ""
+            ) if keyword]
+            index.setdefault(comp_info["subject"].lower(), []).append({
+                "component": {
+                    "id": comp_id,
+                    "title": comp_info["title"],
+                    "type": comp_info["type"],
+                    "duration": comp_info["duration"],
+                    "difficulty": comp_info["difficulty"]
+                },
+                "keywords": keywords
+            })
+        
+        self._component_index = index
+        self._component_index_built_at = now
+        return index
+    
     async def _handle_knowledge_exploration(
         self, 
         content: str, 
@@ -823,57 +1337,52 @@ class EnhancedAITutorService:
     ) -> Dict[str, Any]:
         """Handle knowledge graph exploration requests"""
         try:
-            # Extract concept from content
-            content_words = content.lower().split()
-            
             # Get concept relationships from knowledge graph
             concepts_discussed = []
             relationships_info = []
             
-            # Try to find mentioned concepts in the knowledge graph
-            graph_stats = await self.neo4j.get_graph_statistics()
+            # Simple concept extraction (can be enhanced with NLP), first occurrence of each word
+            potential_concepts = list(dict.fromkeys(word.title() for word in _CONCEPT_WORD_RE.findall(content)))
             
-            # Simple concept extraction (can be enhanced with NLP)
-            potential_concepts = []
-            for word in content_words:
-                if len(word) > 3 and word.isalpha():
-                    potential_concepts.append(word.title())
+            # Get relationships for found concepts in one knowledge graph query
+            candidate_concepts = potential_concepts[:3]  # Limit to 3 concepts
+            # Concepts missing from the graph come back empty; graph errors go to the handler fallback
+            relationships_by_concept = await self._get_concept_relationships(candidate_concepts)
             
-            # Get relationships for found concepts
-            for concept in potential_concepts[:3]:  # Limit to 3 concepts
-                try:
-                    relationships = await self.neo4j.get_concept_relationships(concept)
-                    if relationships and any(relationships.values()):
-                        concepts_discussed.append(concept)
-                        relationships_info.append({
-                            "concept": concept,
-                            "relationships": relationships
-                        })
-                except:
-                    continue
+            for concept in candidate_concepts:
+                relationships = relationships_by_concept.get(concept)
+                if relationships and any(relationships.values()):
+                    concepts_discussed.append(concept)
+                    relationships_info.append({
+                        "concept": concept,
+                        "relationships": relationships
+                    })
+            
+            # Both replies report the graph statistics in their metadata
+            graph_stats = await self._get_graph_statistics()
             
             if relationships_info:
-                response_content = f"🕸️ **Knowledge Graph Exploration**\n\n"
+                parts = ["🕸️ **Knowledge Graph Exploration**\n\n"]
                 
                 for rel_info in relationships_info:
                     concept = rel_info["concept"]
                     rels = rel_info["relationships"]
                     
-                    response_content += f"**{concept} Connections:**\n"
+                    parts.append(f"**{concept} Connections:**\n")
                     
                     if rels.get("prerequisites"):
-                        response_content += f"📚 Prerequisites: {', '.join(rels['prerequisites'])}\n"
+                        parts.append(f"📚 Prerequisites: {', '.join(rels['prerequisites'])}\n")
                     
                     if rels.get("dependents"):
-                        response_content += f"🎯 Leads to: {', '.join(rels['dependents'])}\n"
+                        parts.append(f"🎯 Leads to: {', '.join(rels['dependents'])}\n")
                     
                     if rels.get("related"):
-                        response_content += f"🔗 Related topics: {', '.join(rels['related'])}\n"
+                        parts.append(f"🔗 Related topics: {', '.join(rels['related'])}\n")
                     
                     if rels.get("applications"):
-                        response_content += f"⚡ Applications: {', '.join(rels['applications'])}\n"
+                        parts.append(f"⚡ Applications: {', '.join(rels['applications'])}\n")
                     
-                    response_content += "\n"
+                    parts.append("\n")
                 
                 # Add learning path suggestion
                 if concepts_discussed:
@@ -883,30 +1392,24 @@ class EnhancedAITutorService:
                     )
                     
                     if learning_path.path_nodes:
-                        response_content += f"🛤️ **Suggested Learning Path to {concepts_discussed[0]}:**\n"
+                        parts.append(f"🛤️ **Suggested Learning Path to {concepts_discussed[0]}:**\n")
                         for i, node in enumerate(learning_path.path_nodes, 1):
-                            response_content += f"{i}. {node}\n"
-                        response_content += f"\n⏱️ Estimated time: {learning_path.estimated_duration} minutes\n"
-                        response_content += f"🎯 Confidence: {learning_path.confidence_score:.0%}\n"
+                            parts.append(f"{i}. {node}\n")
+                        parts.append(f"\n⏱️ Estimated time: {learning_path.estimated_duration} minutes\n")
+                        parts.append(f"🎯 Confidence: {learning_path.confidence_score:.0%}\n")
             
             else:
                 # General knowledge graph overview
-                response_content = f"🕸️ **Knowledge Graph Overview**\n\n"
-                response_content += f"📊 **Current Graph Statistics:**\n"
-                response_content += f"• Total concepts: {graph_stats.get('total_nodes', 0)}\n"
-                response_content += f"• Relationships: {graph_stats.get('total_relationships', 0)}\n"
-                response_content += f"• Subjects covered: {', '.join(graph_stats.get('subjects', []))}\n\n"
-                
-                response_content += "🔍 **Ask me about:**\n"
-                response_content += "• How concepts connect to each other\n"
-                response_content += "• Prerequisites for any topic\n"
-                response_content += "• Learning paths to your goals\n"
-                response_content += "• Related topics to explore\n\n"
+                parts = ["🕸️ **Knowledge Graph Overview**\n\n"]
+                parts.append("📊 **Current Graph Statistics:**\n")
+                parts.append(f"• Total concepts: {graph_stats.get('total_nodes', 0)}\n")
+                parts.append(f"• Relationships: {graph_stats.get('total_relationships', 0)}\n")
+                parts.append(f"• Subjects covered: {', '.join(graph_stats.get('subjects', []))}\n\n")
                 
-                response_content += "Try asking: 'How does algebra connect to calculus?' or 'What are the prerequisites for derivatives?'"
+                parts.append(_KNOWLEDGE_GRAPH_PROMPTS)
             
             return {
-                "content": response_content,
+                "content": "".join(parts),
                 "message_type": "knowledge_exploration",
                 "metadata": {
                     "concepts_found": concepts_discussed,
@@ -937,67 +1440,67 @@ class EnhancedAITutorService:
         """Handle queries about learning history and progress"""
         try:
             # Get comprehensive learning patterns from MemMachine
-            learning_patterns = await self.memmachine.analyze_learning_patterns(user_id)
+            learning_patterns = await self._get_learning_patterns(user_id)
             
-            response_content = f"🧠 **Your Learning Memory**\n\n"
+            parts = ["🧠 **Your Learning Memory**\n\n"]
             
             if learning_patterns and not learning_patterns.get('error'):
                 total_sessions = learning_patterns.get('total_sessions', 0)
                 subjects_studied = learning_patterns.get('subjects_studied', 0)
                 velocity = learning_patterns.get('learning_velocity', 1.0)
                 
-                response_content += f"📈 **Learning Statistics:**\n"
-                response_content += f"• Total learning sessions: {total_sessions}\n"
-                response_content += f"• Subjects explored: {subjects_studied}\n"
-                response_content += f"• Learning velocity: {velocity:.1f}x average\n\n"
+                parts.append(_MEMORY_STATS_TMPL.format(total=total_sessions, subjects=subjects_studied, velocity=velocity))
                 
                 # Subject breakdown
                 subject_breakdown = learning_patterns.get('subject_breakdown', {})
                 if subject_breakdown:
-                    response_content += f"📚 **Subject Breakdown:**\n"
-                    for subject, stats in subject_breakdown.items():
-                        count = stats.get('count', 0)
-                        avg_perf = stats.get('avg_performance', 0)
-                        response_content += f"• {subject}: {count} sessions, {avg_perf:.0%} avg performance\n"
-                    response_content += "\n"
+                    parts.append("📚 **Subject Breakdown:**\n")
+                    parts.append("".join(
+                        _MEMORY_SUBJECT_ITEM_TMPL.format(
+                            subject=subject,
+                            count=stats.get('count', 0),
+                            avg_performance=stats.get('avg_performance', 0)
+                        )
+                        # Most studied subjects first, so the order no longer depends on history order
+                        for subject, stats in sorted(
+                            subject_breakdown.items(), key=lambda item: item[1].get('count', 0), reverse=True
+                        )
+                    ))
+                    parts.append("\n")
                 
                 # Focus areas
                 focus_areas = learning_patterns.get('recommended_focus_areas', [])
                 if focus_areas:
-                    response_content += f"🎯 **Areas for Improvement:**\n"
-                    for area in focus_areas[:3]:
-                        topic = area.get('topic', 'Unknown')
-                        performance = area.get('avg_performance', 0)
-                        priority = area.get('priority', 'medium')
-                        response_content += f"• {topic}: {performance:.0%} mastery ({priority} priority)\n"
-                    response_content += "\n"
+                    parts.append("🎯 **Areas for Improvement:**\n")
+                    parts.append("".join(
+                        _MEMORY_FOCUS_ITEM_TMPL.format(
+                            topic=area.get('topic', 'Unknown'),
+                            performance=area.get('avg_performance', 0),
+                            priority=area.get('priority', 'medium')
+                        )
+                        for area in focus_areas[:3]
+                    ))
+                    parts.append("\n")
                 
                 # Recent activity
                 learning_history = session_memory.get('learning_history', [])
                 if learning_history:
-                    response_content += f"🕒 **Recent Activity:**\n"
+                    parts.append("🕒 **Recent Activity:**\n")
                     for entry in learning_history[:3]:
-                        timestamp = entry.timestamp.strftime('%Y-%m-%d %H:%M')
-                        subject = entry.content.get('context', {}).get('subject', 'General')
-                        topic = entry.content.get('context', {}).get('topic', 'Learning')
-                        response_content += f"• {timestamp}: {subject} - {topic}\n"
+                        context = _history_context(entry)
+                        parts.append(_MEMORY_ACTIVITY_ITEM_TMPL.format(
+                            timestamp=_format_activity_time(entry.timestamp),
+                            subject=context.get('subject', 'General'),
+                            topic=context.get('topic', 'Learning')
+                        ))
             
             else:
-                response_content += "I'm still building your learning profile. Keep interacting with me to develop a comprehensive memory of your learning journey!\n\n"
-                response_content += "I'll remember:\n"
-                response_content += "• Topics you've studied\n"
-                response_content += "• Your performance patterns\n"
-                response_content += "• Areas where you excel\n"
-                response_content += "• Concepts that need more practice\n"
-            
-            response_content += "\n💡 **Memory Features:**\n"
-            response_content += "• I remember all our conversations\n"
-            response_content += "• I track your progress across topics\n"
-            response_content += "• I identify your learning patterns\n"
-            response_content += "• I suggest personalized improvements\n"
+                parts.append(_MEMORY_EMPTY_PROFILE)
+            
+            parts.append(_MEMORY_FEATURES)
             
             return {
-                "content": response_content,
+                "content": "".join(parts),
                 "message_type": "memory_insight",
                 "metadata": {
                     "learning_patterns": learning_patterns,
@@ -1031,53 +1534,53 @@ class EnhancedAITutorService:
             recommendations = performance_data.get('recommended_concepts', [])
             knowledge_gaps = performance_data.get('knowledge_gaps', {})
             
-            response_content = f"🎯 **Personalized Learning Plan for You**\n\n"
+            parts = ["🎯 **Personalized Learning Plan for You**\n\n"]
             
             # Current status
             mastery_rate = performance_data.get('mastery_rate', 0)
             learning_velocity = performance_data.get('learning_velocity', 1.0)
             
-            response_content += f"📊 **Your Current Status:**\n"
-            response_content += f"• Mastery rate: {mastery_rate:.0%}\n"
-            response_content += f"• Learning velocity: {learning_velocity:.1f}x\n"
-            response_content += f"• Concepts mastered: {performance_data.get('knowledge_graph_stats', {}).get('mastered_concepts', 0)}\n\n"
+            parts.append("📊 **Your Current Status:**\n")
+            parts.append(f"• Mastery rate: {mastery_rate:.0%}\n")
+            parts.append(f"• Learning velocity: {learning_velocity:.1f}x\n")
+            parts.append(f"• Concepts mastered: {performance_data.get('knowledge_graph_stats', {}).get('mastered_concepts', 0)}\n\n")
             
-            # Personalized recommendations
-            if recommendations:
-                response_content += f"🌟 **Recommended Next Steps:**\n"
-                for i, rec in enumerate(recommendations[:3], 1):
+            # Personalized recommendations, best match first regardless of upstream order
+            top_recommendations = heapq.nlargest(3, recommendations, key=lambda rec: rec.get('score', 0))
+            if top_recommendations:
+                parts.append("🌟 **Recommended Next Steps:**\n")
+                for i, rec in enumerate(top_recommendations, 1):
                     concept = rec.get('concept', 'Unknown')
                     score = rec.get('score', 0)
                     duration = rec.get('estimated_duration', 30)
                     difficulty = rec.get('difficulty_level', 1)
                     
-                    response_content += f"{i}. **{concept}**\n"
-                    response_content += f"   • Match score: {score:.0%}\n"
-                    response_content += f"   • Estimated time: {duration} minutes\n"
-                    response_content += f"   • Difficulty: Level {difficulty}\n\n"
+                    parts.append(f"{i}. **{concept}**\n")
+                    parts.append(f"   • Match score: {score:.0%}\n")
+                    parts.append(f"   • Estimated time: {duration} minutes\n")
+                    parts.append(f"   • Difficulty: Level {difficulty}\n\n")
             
             # Weak areas to focus on
             weak_areas = knowledge_gaps.get('weak_areas', [])
             if weak_areas:
-                response_content += f"💪 **Areas to Strengthen:**\n"
-                for area in weak_areas[:3]:
+                parts.append("💪 **Areas to Strengthen:**\n")
+                for area in heapq.nsmallest(3, weak_areas, key=lambda area: area.get('mastery_level', 0)):
                     concept = area.get('concept', 'Unknown')
                     mastery = area.get('mastery_level', 0)
-                    response_content += f"• {concept}: {mastery:.0%} mastery\n"
-                response_content += "\n"
+                    parts.append(f"• {concept}: {mastery:.0%} mastery\n")
+                parts.append("\n")
             
-            response_content += "🚀 **What would you like to focus on?**\n"
-            response_content += "I can create an interactive learning session tailored to your level!"
+            parts.append(_PERSONALIZED_CLOSING)
             
             return {
-                "content": response_content,
+                "content": "".join(parts),
                 "message_type": "personalized_plan",
                 "metadata": {
                     "recommendations": recommendations,
                     "weak_areas": weak_areas,
                     "personalization_score": 0.95
                 },
-                "concepts_discussed": [rec.get('concept', '') for rec in recommendations[:3]],
+                "concepts_discussed": [rec.get('concept', '') for rec in top_recommendations],
                 "interactive_suggestions": [],
                 "quality_score": 0.95,
                 "helpfulness_score": 0.9
@@ -1113,45 +1616,43 @@ class EnhancedAITutorService:
                     "interactive_suggestions": []
                 }
             
-            response_content = f"💪 **Let's Strengthen Your Weak Areas!**\n\n"
-            response_content += f"I've identified {len(weak_areas)} areas where focused practice will help:\n\n"
+            parts = ["💪 **Let's Strengthen Your Weak Areas!**\n\n"]
+            parts.append(f"I've identified {len(weak_areas)} areas where focused practice will help:\n\n")
+            
+            # Learning paths for the listed concepts are independent; look them up concurrently
+            # Knowledge gap analysis lists weak areas in graph order; show the three weakest
+            top_weak_areas = heapq.nsmallest(3, weak_areas, key=lambda area: area.get('mastery_level', 0))
+            learning_paths = await asyncio.gather(
+                *(self.neo4j.find_learning_path(user_id, area.get('concept', 'Unknown')) for area in top_weak_areas),
+                return_exceptions=True
+            )
             
-            for i, area in enumerate(weak_areas[:3], 1):
+            for i, (area, learning_path) in enumerate(zip(top_weak_areas, learning_paths), 1):
                 concept = area.get('concept', 'Unknown')
                 mastery = area.get('mastery_level', 0)
                 attempts = area.get('attempts', 0)
                 
-                response_content += f"**{i}. {concept}**\n"
-                response_content += f"   • Current mastery: {mastery:.0%}\n"
-                response_content += f"   • Practice attempts: {attempts}\n"
+                parts.append(f"**{i}. {concept}**\n")
+                parts.append(f"   • Current mastery: {mastery:.0%}\n")
+                parts.append(f"   • Practice attempts: {attempts}\n")
                 
-                # Get learning path for this concept
-                try:
-                    learning_path = await self.neo4j.find_learning_path(user_id, concept)
-                    if learning_path.path_nodes:
-                        response_content += f"   • Prerequisites: {', '.join(learning_path.path_nodes[:-1])}\n"
-                        response_content += f"   • Estimated time: {learning_path.estimated_duration} minutes\n"
-                except:
-                    pass
+                # A failed lookup just leaves the path details out
+                if not isinstance(learning_path, Exception) and learning_path.path_nodes:
+                    parts.append(f"   • Prerequisites: {', '.join(learning_path.path_nodes[:-1])}\n")
+                    parts.append(f"   • Estimated time: {learning_path.estimated_duration} minutes\n")
                 
-                response_content += "\n"
-            
-            response_content += "🎯 **Improvement Strategy:**\n"
-            response_content += "1. Review prerequisites and fundamentals\n"
-            response_content += "2. Practice with interactive simulations\n"
-            response_content += "3. Solve progressively harder problems\n"
-            response_content += "4. Regular review and assessment\n\n"
+                parts.append("\n")
             
-            response_content += "Which area would you like to work on first? I can create a targeted practice session!"
+            parts.append(_WEAKNESS_STRATEGY)
             
             return {
-                "content": response_content,
+                "content": "".join(parts),
                 "message_type": "weakness_improvement",
                 "metadata": {
                     "weak_areas": weak_areas,
                     "improvement_plan_available": True
                 },
-                "concepts_discussed": [area.get('concept', '') for area in weak_areas[:3]],
+                "concepts_discussed": [area.get('concept', '') for area in top_weak_areas],
                 "interactive_suggestions": [],
                 "quality_score": 0.9,
                 "helpfulness_score": 0.95
@@ -1181,8 +1682,7 @@ class EnhancedAITutorService:
         # Add memory-based personalization
         learning_history = session_memory.get('learning_history', [])
         if learning_history:
-            last_session = learning_history[0]
-            last_topic = last_session.content.get('context', {}).get('topic', '')
+            last_topic = _history_context(learning_history[0]).get('topic', '')
             
             if last_topic:
                 basic_greeting["content"] += f"\n\n💡 Last time we worked on {last_topic}. Would you like to continue or explore something new?"
@@ -1198,10 +1698,14 @@ class EnhancedAITutorService:
         user_id: str, 
         subject: Subject, 
         conversation_context: str, 
-        performance_data: Dict[str, Any]
+        performance_data: Dict[str, Any],
+        rag_response_task: Optional["asyncio.Task"] = None
     ) -> Dict[str, Any]:
         """Enhanced question handler with concept tracking"""
-        basic_response = await self._handle_question(content, user_id, subject, conversation_context, performance_data)
+        basic_response = await self._handle_question(
+            content, user_id, subject, conversation_context, performance_data,
+            rag_response_task=rag_response_task
+        )
         
         # Extract concepts from the response
         concepts_discussed = []
@@ -1218,6 +1722,22 @@ class EnhancedAITutorService:
         
         return basic_response
     
+    async def _query_rag(self, content: str, subject: Optional[Subject]):
+        """RAG lookup for a question, preferring the subject's content
+        
+        The subject boosts ranking rather than filtering, so a question with nothing
+        in its subject still finds other material in the same single query.
+        """
+        rag_query = RAGQuery(
+            query=content,
+            subject=subject,
+            subject_as_boost=True,
+            top_k=10,  # Get more results
+            confidence_threshold=0.1  # Very low threshold
+        )
+        
+        return await rag_service.query(rag_query)
+    
     async def _handle_homework_help_enhanced(
         self, 
         content: str, 
@@ -1267,41 +1787,57 @@ class EnhancedAITutorService:
         
         return basic_response
     
-    def _classify_intent(self, content: str) -> str:
-        """Classify the intent of the student's message"""
-        content_lower = content.lower().strip()
-        
-        # Greeting keywords - handle with Gemini for friendly responses
-        greeting_keywords = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening", "greetings", "how are you", "how's it going", "what's up"]
+    def _is_plain_question(self, content_lower: str, words: AbstractSet[str]) -> bool:
+        """Whether _classify_intent_enhanced can only return "question" for this message
         
-        homework_keywords = ["homework", "assignment", "solve this", "help me with", "can you solve", "how do i solve"]
-        lesson_plan_keywords = ["lesson plan", "study plan", "learning plan", "create a plan", "personalized plan", "study schedule"]
-        # Expanded question keywords - treat most messages as questions to use RAG
-        question_keywords = ["what", "why", "how", "explain", "tell me", "?", "question", "help", "understand", "learn", "teach", "show", "describe", "define", "meaning", "is", "are", "can", "could", "would", "should"]
-        
-        # Check for greetings first
-        if any(keyword in content_lower for keyword in greeting_keywords) and len(content_lower.split()) <= 5:
+        Decided without the conversation context: a message mentioning "help" or
+        "improve" could still be a weak-area request, so it does not count.
+        """
+        if self._classify_intent(content_lower, words) != "question":
+            return False
+        if len(content_lower) < 4:
+            return True
+        return (
+            "help" not in content_lower
+            and "improve" not in content_lower
+            and _match_intent_phrases(_ENHANCED_INTENT_BY_PHRASE, _ENHANCED_INTENT_RE, content_lower) is None
+        )
+    
+    def _classify_intent(self, content_lower: str, words: AbstractSet[str]) -> str:
+        """Classify the intent of the student's message (lowercased/stripped text and its word set)"""
+        # Check for greetings first - handled with Gemini for friendly responses;
+        # the word count only matters once a greeting is found
+        if (
+            not _GREETING_WORDS.isdisjoint(words)
+            or _GREETING_PHRASES_RE.search(content_lower)
+        ) and len(content_lower.split()) <= 5:
             return "greeting"
-        elif any(keyword in content_lower for keyword in homework_keywords):
-            return "homework_help"
-        elif any(keyword in content_lower for keyword in lesson_plan_keywords):
-            return "lesson_plan_request"
-        elif any(keyword in content_lower for keyword in question_keywords) or len(content.strip()) > 10:
-            # Treat as question if it has question keywords OR is a substantial message
-            return "question"
-        else:
-            # Even general messages should try RAG first
-            return "question"
+        
+        # Homework and lesson plan phrases in one pass, homework first;
+        # everything else is treated as a question so it goes through RAG
+        return _match_intent_phrases(_BASIC_INTENT_BY_PHRASE, _BASIC_INTENT_RE, content_lower) or "question"
     
     async def _get_student_performance(self, user_id: str, subject: Subject) -> Dict[str, Any]:
         """Get student performance data for personalization"""
+        cache_key = student_performance_key(user_id, subject.value)
+        cached = await cache_service.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        performance = await self._fetch_student_performance(user_id, subject)
+        await cache_service.set(cache_key, performance, PERFORMANCE_CACHE_TTL)
+        return performance
+    
+    async def _fetch_student_performance(self, user_id: str, subject: Subject) -> Dict[str, Any]:
+        """Compute the performance summary from the progress table"""
         try:
-            # Get progress data
-            progress_result = self.supabase.table("progress")\
-                .select("*")\
+            # Get progress data - only the columns the summary uses, weakest first
+            progress_query = self.supabase.table("progress")\
+                .select("topic_id, mastery_score, questions_attempted")\
                 .eq("user_id", user_id)\
                 .eq("subject", subject.value)\
-                .execute()
+                .order("mastery_score")
+            progress_result = await self._execute(progress_query)
             
             if not progress_result.data:
                 return {
@@ -1312,26 +1848,22 @@ class EnhancedAITutorService:
                     "topics_attempted": 0
                 }
             
-            mastery_scores = [p.get("mastery_score", 0) for p in progress_result.data]
-            average_mastery = sum(mastery_scores) / len(mastery_scores) if mastery_scores else 0
+            rows = progress_result.data
+            total_topics = len(rows)
+            mastery = np.fromiter((p.get("mastery_score", 0) for p in rows), dtype=np.float64, count=total_topics)
+            attempted = np.fromiter((p.get("questions_attempted", 0) for p in rows), dtype=np.int64, count=total_topics)
             
-            # Identify weak and strong topics
-            weak_topics = [
-                {"topic_id": p.get("topic_id"), "mastery": p.get("mastery_score", 0)}
-                for p in progress_result.data if p.get("mastery_score", 0) < 60
-            ]
-            
-            strong_topics = [
-                {"topic_id": p.get("topic_id"), "mastery": p.get("mastery_score", 0)}
-                for p in progress_result.data if p.get("mastery_score", 0) >= 80
-            ]
+            # Rows arrive in ascending mastery: the first 5 below 60 are the weakest
+            # topics, the last 5 at or above 80 the strongest
+            weak_idx = np.flatnonzero(mastery < 60)[:5]
+            strong_idx = np.flatnonzero(mastery >= 80)[-5:][::-1]
             
             return {
-                "average_mastery": average_mastery,
-                "weak_topics": weak_topics[:5],  # Top 5 weak topics
-                "strong_topics": strong_topics[:5],  # Top 5 strong topics
-                "total_topics": len(progress_result.data),
-                "topics_attempted": len([p for p in progress_result.data if p.get("questions_attempted", 0) > 0])
+                "average_mastery": float(mastery.mean()),
+                "weak_topics": [{"topic_id": rows[i].get("topic_id"), "mastery": rows[i].get("mastery_score", 0)} for i in weak_idx],  # Top 5 weak topics
+                "strong_topics": [{"topic_id": rows[i].get("topic_id"), "mastery": rows[i].get("mastery_score", 0)} for i in strong_idx],  # Top 5 strong topics
+                "total_topics": total_topics,
+                "topics_attempted": int(np.count_nonzero(attempted > 0))
             }
             
         except Exception as e:
@@ -1344,6 +1876,22 @@ class EnhancedAITutorService:
                 "topics_attempted": 0
             }
     
+    async def _get_student_name(self, user_id: str) -> str:
+        """Get the student's display name, cached so repeat greetings skip the profile read"""
+        cache_key = f"profile_name:{user_id}"
+        student_name = await cache_service.get(cache_key)
+        if student_name is not None:
+            return student_name
+        
+        profile_query = self.supabase.table("profiles")\
+            .select("full_name")\
+            .eq("user_id", user_id)
+        profile_result = await self._execute(profile_query)
+        
+        student_name = profile_result.data[0].get("full_name", "there") if profile_result.data else "there"
+        await cache_service.set(cache_key, student_name, PROFILE_CACHE_TTL)
+        return student_name
+    
     async def _handle_greeting(
         self,
         content: str,
@@ -1355,12 +1903,7 @@ class EnhancedAITutorService:
         """Handle greeting messages with Gemini for friendly, conversational responses"""
         try:
             # Get student name if available
-            profile_result = self.supabase.table("profiles")\
-                .select("full_name")\
-                .eq("user_id", user_id)\
-                .execute()
-            
-            student_name = profile_result.data[0].get("full_name", "there") if profile_result.data else "there"
+            student_name = await self._get_student_name(user_id)
             
             # Build friendly greeting prompt
             # Build context part separately to avoid backslash in f-string expression
@@ -1382,9 +1925,9 @@ Examples of good responses:
 Respond naturally and warmly:"""
             
             if self.gemini_enabled and self.model:
-                response = self.model.generate_content(prompt)
+                response_text = await self._cached_generate(prompt, GREETING_CACHE_TTL, stream=True)
                 return {
-                    "content": response.text,
+                    "content": response_text,
                     "message_type": "greeting",
                     "metadata": {
                         "gemini_used": True,
@@ -1421,30 +1964,18 @@ Respond naturally and warmly:"""
         user_id: str,
         subject: Subject,
         context: str,
-        performance_data: Dict[str, Any]
+        performance_data: Dict[str, Any],
+        rag_response_task: Optional["asyncio.Task"] = None
     ) -> Dict[str, Any]:
-        """Handle a student question - ONLY using RAG from your data"""
+        """Handle a student question - ONLY using RAG from your data
+        
+        rag_response_task, if given, is a _query_rag call already in flight for this message.
+        """
         try:
-            # Try RAG with subject filter first
-            rag_query = RAGQuery(
-                query=content,
-                subject=subject,
-                top_k=10,  # Get more results
-                confidence_threshold=0.1  # Very low threshold
-            )
-            
-            rag_response = await rag_service.query(rag_query)
-            
-            # If no results with subject, try without subject filter
-            if (not rag_response.contexts or len(rag_response.contexts) == 0) and subject:
-                print(f"No results with subject filter, trying without subject...")
-                rag_query_no_subject = RAGQuery(
-                    query=content,
-                    subject=None,  # Remove subject filter
-                    top_k=10,
-                    confidence_threshold=0.1
-                )
-                rag_response = await rag_service.query(rag_query_no_subject)
+            if rag_response_task is not None:
+                rag_response = await rag_response_task
+            else:
+                rag_response = await self._query_rag(content, subject)
             
             # If still no results, return helpful message
             if not rag_response.contexts or len(rag_response.contexts) == 0:
@@ -1580,83 +2111,27 @@ Respond naturally and warmly:"""
             hours_per_day = 2.0
             
             # Try to extract days and hours from content
-            days_match = re.search(r'(\d+)\s*(?:day|days)', content.lower())
+            content_lower = content.lower()
+            days_match = _PLAN_DAYS_RE.search(content_lower)
             if days_match:
                 days = int(days_match.group(1))
             
-            hours_match = re.search(r'(\d+(?:\.\d+)?)\s*(?:hour|hours)', content.lower())
+            hours_match = _PLAN_HOURS_RE.search(content_lower)
             if hours_match:
                 hours_per_day = float(hours_match.group(1))
             
             # Get weak topics for focus
             weak_topics = performance_data.get("weak_topics", [])
+            today = datetime.utcnow().date()
             
-            # Get all topics for the subject
-            topics_result = self.supabase.table("topics")\
-                .select("*")\
-                .eq("subject", subject.value)\
-                .order("order_index")\
-                .execute()
-            
-            all_topics = topics_result.data or []
-            
-            # Build prompt for personalized lesson plan
-            prompt = f"""Create a personalized {days}-day lesson plan for a Class 12 {subject.value} student.
-
-Student Performance:
-- Average Mastery: {performance_data.get('average_mastery', 0):.1f}%
-- Weak Areas: {len(weak_topics)} topics need improvement
-- Strong Areas: {len(performance_data.get('strong_topics', []))} topics mastered
-- Topics Attempted: {performance_data.get('topics_attempted', 0)}/{performance_data.get('total_topics', 0)}
-
-Available Time: {hours_per_day} hours per day for {days} days
-
-All Topics to Cover:
-{json.dumps([{'name': t.get('name'), 'chapter': t.get('chapter')} for t in all_topics[:15]], indent=2)}
-
-Create a detailed, personalized lesson plan that:
-1. Focuses on improving weak areas (60% of time)
-2. Reinforces strong areas (20% of time)
-3. Introduces new topics (20% of time)
-4. Includes daily practice problems
-5. Has review sessions every 3 days
-6. Includes assessment checkpoints
-
-Format as JSON:
-{{
-  "plan_name": "Personalized {subject.value} Plan",
-  "duration_days": {days},
-  "daily_schedule": [
-    {{
-      "day": 1,
-      "date": "YYYY-MM-DD",
-      "focus_areas": ["topic1", "topic2"],
-      "activities": [
-        {{"type": "concept_review", "topic": "topic1", "duration_minutes": 30, "description": "..."}},
-        {{"type": "practice", "topic": "topic1", "duration_minutes": 45, "difficulty": "medium", "description": "..."}},
-        {{"type": "weak_area_focus", "topic": "weak_topic", "duration_minutes": 30, "description": "..."}}
-      ],
-      "goals": ["goal1", "goal2"],
-      "estimated_hours": {hours_per_day}
-    }}
-  ],
-  "review_days": [3, 6],
-  "assessment_checkpoints": [
-    {{"day": 3, "type": "quiz", "topics": ["topic1", "topic2"], "marks": 20}}
-  ],
-  "focus_on_weak_areas": {len(weak_topics) > 0},
-  "weak_topics_to_improve": {json.dumps([t.get('topic_id') for t in weak_topics[:5]])}
-}}"""
+            # Static subject preamble first so Gemini can reuse the cached prefix
+            preamble = await self._get_lesson_plan_preamble(subject, CHAT_LESSON_PLAN_TOPICS)
+            prompt = preamble + self._build_chat_lesson_plan_request(subject, performance_data, days, hours_per_day)
             
             if self.gemini_enabled and self.model:
-                response = self.model.generate_content(prompt)
-                plan_text = response.text
-                
-                # Parse JSON
-                json_match = re.search(r'\{.*\}', plan_text, re.DOTALL)
-                if json_match:
-                    plan_data = json.loads(json_match.group())
-                else:
+                # JSON mode: the whole response is the plan object
+                plan_data = await self._generate_json(prompt, LESSON_PLAN_CACHE_TTL)
+                if plan_data is None:
                     raise APIException(
                         code="PARSE_LESSON_PLAN_ERROR",
                         message="Failed to parse lesson plan",
@@ -1672,7 +2147,7 @@ Format as JSON:
                     "daily_schedule": [
                         {
                             "day": i + 1,
-                            "date": (datetime.now() + timedelta(days=i)).strftime("%Y-%m-%d"),
+                            "date": (today + timedelta(days=i)).isoformat(),
                             "focus_areas": [f"Topic {i+1}"],
                             "activities": [
                                 {
@@ -1708,12 +2183,12 @@ Format as JSON:
                 "plan_data": plan_data,
                 "based_on_performance": True,
                 "performance_snapshot": performance_data,
-                "start_date": datetime.now().date().isoformat(),
-                "end_date": (datetime.now() + timedelta(days=days)).date().isoformat(),
+                "start_date": today.isoformat(),
+                "end_date": (today + timedelta(days=days)).isoformat(),
                 "is_active": True
             }
             
-            plan_result = self.supabase.table("ai_tutor_lesson_plans").insert(lesson_plan_data).execute()
+            lesson_plan_id = self._persist_lesson_plan_in_background(lesson_plan_data)
             
             response_content = f"""📚 **Personalized Lesson Plan Created!**
 
@@ -1731,13 +2206,13 @@ I've created a {days}-day lesson plan for {subject.value} based on your performa
 - Total Hours: {days * hours_per_day} hours
 - Focus Areas: {len(weak_topics)} topics to strengthen
 
-The plan has been saved and you can access it anytime. Would you like me to explain any specific day's schedule in detail?"""
+I'm saving the plan to your lesson plans in the background; if it doesn't show up there, just ask me to create it again. Would you like me to explain any specific day's schedule in detail?"""
             
             return {
                 "content": response_content,
                 "message_type": "lesson_plan",
                 "metadata": {
-                    "lesson_plan_id": plan_result.data[0]["id"] if plan_result.data else None,
+                    "lesson_plan_id": lesson_plan_id,
                     "plan_data": plan_data
                 }
             }
@@ -1773,33 +2248,106 @@ The plan has been saved and you can access it anytime. Would you like me to expl
                 }
             }
     
-    async def generate_performance_based_lesson_plan(
+    async def _get_lesson_plan_preamble(self, subject: Subject, topic_limit: int) -> str:
+        """Get the lesson-plan preamble for a subject, rebuilt at most every LESSON_PREAMBLE_CACHE_TTL"""
+        cache_key = f"lesson_preamble:{subject.value}:{topic_limit}"
+        preamble = await cache_service.get(cache_key)
+        if preamble is not None:
+            return preamble
+        
+        # Only the first topic_limit topics' names and chapters make it into the prompt
+        topics_query = self.supabase.table("topics")\
+            .select("name, chapter")\
+            .eq("subject", subject.value)\
+            .order("order_index")\
+            .limit(topic_limit)
+        topics_result = await self._execute(topics_query)
+        
+        preamble = self._build_lesson_plan_preamble(subject, topics_result.data or [])
+        await cache_service.set(cache_key, preamble, LESSON_PREAMBLE_CACHE_TTL)
+        return preamble
+    
+    def _build_lesson_plan_preamble(self, subject: Subject, all_topics: List[Dict[str, Any]]) -> str:
+        """Static start of the lesson-plan prompt: the subject and its topic list.
+        
+        It is identical for every student of a subject, so Gemini's implicit
+        context caching can reuse it; each path appends its own rubric and schema.
+        """
+        topics_json = json.dumps([{'name': t.get('name'), 'chapter': t.get('chapter')} for t in all_topics], indent=2)
+        return f"""You create personalized lesson plans for Class 12 {subject.value} students.
+
+**All Topics:**
+{topics_json}
+
+"""
+    
+    def _build_chat_lesson_plan_request(
         self,
-        user_id: str,
         subject: Subject,
-        days: int = 7,
-        hours_per_day: float = 2.0
-    ) -> Dict[str, Any]:
-        """Generate a personalized lesson plan based on student performance"""
-        try:
-            # Get performance data
-            performance_data = await self._get_student_performance(user_id, subject)
-            
-            # Get topics
-            topics_result = self.supabase.table("topics")\
-                .select("*")\
-                .eq("subject", subject.value)\
-                .order("order_index")\
-                .execute()
-            
-            all_topics = topics_result.data or []
-            
-            # Build comprehensive prompt
-            prompt = f"""Create a comprehensive, personalized {days}-day lesson plan for a Class 12 {subject.value} student.
+        performance_data: Dict[str, Any],
+        days: int,
+        hours_per_day: float
+    ) -> str:
+        """Per-student part of the chat lesson-plan prompt, appended after the preamble"""
+        weak_topics = performance_data.get('weak_topics', [])
+        return f"""Create a personalized {days}-day lesson plan for a Class 12 {subject.value} student.
+
+Student Performance:
+- Average Mastery: {performance_data.get('average_mastery', 0):.1f}%
+- Weak Areas: {len(weak_topics)} topics need improvement
+- Strong Areas: {len(performance_data.get('strong_topics', []))} topics mastered
+- Topics Attempted: {performance_data.get('topics_attempted', 0)}/{performance_data.get('total_topics', 0)}
+
+Available Time: {hours_per_day} hours per day for {days} days
+
+Create a detailed, personalized lesson plan that:
+1. Focuses on improving weak areas (60% of time)
+2. Reinforces strong areas (20% of time)
+3. Introduces new topics (20% of time)
+4. Includes daily practice problems
+5. Has review sessions every 3 days
+6. Includes assessment checkpoints
+
+Format as JSON:
+{{
+  "plan_name": "Personalized {subject.value} Plan",
+  "duration_days": {days},
+  "daily_schedule": [
+    {{
+      "day": 1,
+      "date": "YYYY-MM-DD",
+      "focus_areas": ["topic1", "topic2"],
+      "activities": [
+        {{"type": "concept_review", "topic": "topic1", "duration_minutes": 30, "description": "..."}},
+        {{"type": "practice", "topic": "topic1", "duration_minutes": 45, "difficulty": "medium", "description": "..."}},
+        {{"type": "weak_area_focus", "topic": "weak_topic", "duration_minutes": 30, "description": "..."}}
+      ],
+      "goals": ["goal1", "goal2"],
+      "estimated_hours": {hours_per_day}
+    }}
+  ],
+  "review_days": [3, 6],
+  "assessment_checkpoints": [
+    {{"day": 3, "type": "quiz", "topics": ["topic1", "topic2"], "marks": 20}}
+  ],
+  "focus_on_weak_areas": {len(weak_topics) > 0},
+  "weak_topics_to_improve": {json.dumps([t.get('topic_id') for t in weak_topics[:5]])}
+}}"""
+    
+    def _build_lesson_plan_request(
+        self,
+        subject: Subject,
+        performance_data: Dict[str, Any],
+        days: int,
+        hours_per_day: float
+    ) -> str:
+        """Per-student part of the performance-based lesson-plan prompt, appended after the preamble"""
+        weak_topics = performance_data.get('weak_topics', [])
+        return f"""Create a comprehensive, personalized {days}-day lesson plan for a Class 12 {subject.value} student.
 
 **Student Performance Analysis:**
 - Average Mastery Score: {performance_data.get('average_mastery', 0):.1f}%
-- Weak Topics (need improvement): {len(performance_data.get('weak_topics', []))}
+- Weak Topics (need improvement): {len(weak_topics)}
 - Strong Topics (mastered): {len(performance_data.get('strong_topics', []))}
 - Total Topics Covered: {performance_data.get('topics_attempted', 0)}/{performance_data.get('total_topics', 0)}
 
@@ -1808,9 +2356,6 @@ The plan has been saved and you can access it anytime. Would you like me to expl
 - {days} days total
 - {days * hours_per_day} total hours
 
-**All Topics:**
-{json.dumps([{'name': t.get('name'), 'chapter': t.get('chapter')} for t in all_topics[:20]], indent=2)}
-
 **Create a detailed plan with:**
 1. Daily schedule with specific topics and activities
 2. 60% focus on weak areas, 20% on new topics, 20% on reinforcement
@@ -1866,98 +2411,24 @@ The plan has been saved and you can access it anytime. Would you like me to expl
     {{"day": 3, "type": "quiz", "topics": ["topic1", "topic2"], "marks": 20, "duration_minutes": 30}},
     {{"day": 7, "type": "test", "topics": ["all_week"], "marks": 50, "duration_minutes": 60}}
   ],
-  "weak_topics_focus": {json.dumps([t.get('topic_id') for t in performance_data.get('weak_topics', [])[:5]])},
+  "weak_topics_focus": {json.dumps([t.get('topic_id') for t in weak_topics[:5]])},
   "learning_objectives": ["objective1", "objective2"]
 }}"""
-            
-            if self.gemini_enabled and self.model:
-                response = self.model.generate_content(prompt)
-                plan_text = response.text
-                
-                # Parse JSON
-                json_match = re.search(r'\{.*\}', plan_text, re.DOTALL)
-                if json_match:
-                    plan_data = json.loads(json_match.group())
-                else:
-                    raise APIException(
-                        code="PARSE_LESSON_PLAN_RESPONSE_ERROR",
-                        message="Failed to parse lesson plan response",
-                        status_code=500
-                    )
-            else:
-                # Fallback lesson plan without Gemini
-                plan_data = {
-                    "plan_name": f"Personalized {subject.value} Improvement Plan",
-                    "duration_days": days,
-                    "total_hours": days * hours_per_day,
-                    "focus_strategy": "60% weak areas, 20% new topics, 20% reinforcement",
-                    "daily_schedule": [
-                        {
-                            "day": i + 1,
-                            "date": (datetime.now() + timedelta(days=i)).strftime("%Y-%m-%d"),
-                            "focus_areas": [f"Focus Area {i+1}"],
-                            "activities": [
-                                {
-                                    "type": "concept_learning",
-                                    "topic": f"Topic {i+1}",
-                                    "duration_minutes": int(hours_per_day * 20),
-                                    "description": "Learn core concepts",
-                                    "resources": ["NCERT", "Practice problems"]
-                                },
-                                {
-                                    "type": "practice",
-                                    "topic": f"Topic {i+1}",
-                                    "duration_minutes": int(hours_per_day * 30),
-                                    "difficulty": "medium",
-                                    "question_count": 10,
-                                    "description": "Practice problems"
-                                },
-                                {
-                                    "type": "weak_area_focus",
-                                    "topic": "weak_topic",
-                                    "duration_minutes": int(hours_per_day * 10),
-                                    "description": "Extra practice on weak area"
-                                }
-                            ],
-                            "goals": [f"Master concept {i+1}", "Solve practice problems"],
-                            "estimated_hours": hours_per_day,
-                            "review_topics": [f"previous_topic_{i}"] if i > 0 else []
-                        }
-                        for i in range(days)
-                    ],
-                    "review_schedule": [
-                        {"day": 3, "topics": ["topic1", "topic2"], "type": "quick_review"},
-                        {"day": 6, "topics": ["all_week_topics"], "type": "comprehensive_review"}
-                    ],
-                    "assessment_checkpoints": [
-                        {"day": 3, "type": "quiz", "topics": ["topic1", "topic2"], "marks": 20, "duration_minutes": 30},
-                        {"day": 7, "type": "test", "topics": ["all_week"], "marks": 50, "duration_minutes": 60}
-                    ],
-                    "weak_topics_focus": [t.get('topic_id') for t in performance_data.get('weak_topics', [])[:5]],
-                    "learning_objectives": ["Improve weak areas", "Build strong foundation"]
-                }
-            
-            # Save to database
-            lesson_plan_data = {
-                "user_id": user_id,
-                "subject": subject.value,
-                "plan_name": plan_data.get("plan_name", f"Personalized {subject.value} Plan"),
-                "plan_data": plan_data,
-                "based_on_performance": True,
-                "performance_snapshot": performance_data,
-                "start_date": datetime.now().date().isoformat(),
-                "end_date": (datetime.now() + timedelta(days=days)).date().isoformat(),
-                "is_active": True
-            }
-            
-            result = self.supabase.table("ai_tutor_lesson_plans").insert(lesson_plan_data).execute()
-            
-            return {
-                "lesson_plan_id": result.data[0]["id"] if result.data else None,
-                "plan": plan_data,
-                "performance_data": performance_data,
-                "generated_at": datetime.utcnow().isoformat()
-            }
+    
+    async def generate_performance_based_lesson_plan(
+        self,
+        user_id: str,
+        subject: Subject,
+        days: int = 7,
+        hours_per_day: float = 2.0
+    ) -> Dict[str, Any]:
+        """Generate a personalized lesson plan based on student performance"""
+        try:
+            lesson_plan_data, result = await self._build_performance_based_lesson_plan(
+                user_id, subject, days, hours_per_day
+            )
+            result["lesson_plan_id"] = self._persist_lesson_plan_in_background(lesson_plan_data)
+            return result
             
         except Exception as e:
             raise APIException(
@@ -1966,16 +2437,169 @@ The plan has been saved and you can access it anytime. Would you like me to expl
                 status_code=500
             )
     
+    async def generate_lesson_plans_bulk(
+        self,
+        user_ids: List[str],
+        subject: Subject,
+        days: int = 7,
+        hours_per_day: float = 2.0
+    ) -> Dict[str, Any]:
+        """Generate lesson plans for several students, e.g. a whole class, saving them in one insert"""
+        semaphore = asyncio.Semaphore(BULK_LESSON_PLAN_CONCURRENCY)
+        
+        async def build(user_id: str):
+            async with semaphore:
+                return await self._build_performance_based_lesson_plan(user_id, subject, days, hours_per_day)
+        
+        outcomes = await asyncio.gather(*(build(user_id) for user_id in user_ids), return_exceptions=True)
+        
+        rows, plans, errors = [], [], []
+        for user_id, outcome in zip(user_ids, outcomes):
+            if isinstance(outcome, Exception):
+                errors.append({"user_id": user_id, "error": str(outcome)})
+                continue
+            lesson_plan_data, result = outcome
+            rows.append(lesson_plan_data)
+            plans.append({"user_id": user_id, **result})
+        
+        if rows:
+            for plan, lesson_plan_id in zip(plans, self._persist_lesson_plans_in_background(rows)):
+                plan["lesson_plan_id"] = lesson_plan_id
+        
+        return {
+            "lesson_plans": plans,
+            "errors": errors
+        }
+    
+    async def _build_performance_based_lesson_plan(
+        self,
+        user_id: str,
+        subject: Subject,
+        days: int,
+        hours_per_day: float
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Generate a lesson plan; returns the row to save and the response payload"""
+        # Performance data and the subject's topic preamble are independent reads
+        performance_data, preamble = await asyncio.gather(
+            self._get_student_performance(user_id, subject),
+            self._get_lesson_plan_preamble(subject, PERFORMANCE_LESSON_PLAN_TOPICS)
+        )
+        # One UTC clock read for the plan dates and generated_at
+        now = datetime.utcnow()
+        today = now.date()
+        
+        # Static subject preamble first so Gemini can reuse the cached prefix
+        prompt = preamble + self._build_lesson_plan_request(subject, performance_data, days, hours_per_day)
+        
+        if self.gemini_enabled and self.model:
+            # JSON mode: the whole response is the plan object
+            plan_data = await self._generate_json(prompt, LESSON_PLAN_CACHE_TTL)
+            if plan_data is None:
+                raise APIException(
+                    code="PARSE_LESSON_PLAN_RESPONSE_ERROR",
+                    message="Failed to parse lesson plan response",
+                    status_code=500
+                )
+        else:
+            # Fallback lesson plan without Gemini
+            plan_data = {
+                "plan_name": f"Personalized {subject.value} Improvement Plan",
+                "duration_days": days,
+                "total_hours": days * hours_per_day,
+                "focus_strategy": "60% weak areas, 20% new topics, 20% reinforcement",
+                "daily_schedule": [
+                    {
+                        "day": i + 1,
+                        "date": (today + timedelta(days=i)).isoformat(),
+                        "focus_areas": [f"Focus Area {i+1}"],
+                        "activities": [
+                            {
+                                "type": "concept_learning",
+                                "topic": f"Topic {i+1}",
+                                "duration_minutes": int(hours_per_day * 20),
+                                "description": "Learn core concepts",
+                                "resources": ["NCERT", "Practice problems"]
+                            },
+                            {
+                                "type": "practice",
+                                "topic": f"Topic {i+1}",
+                                "duration_minutes": int(hours_per_day * 30),
+                                "difficulty": "medium",
+                                "question_count": 10,
+                                "description": "Practice problems"
+                            },
+                            {
+                                "type": "weak_area_focus",
+                                "topic": "weak_topic",
+                                "duration_minutes": int(hours_per_day * 10),
+                                "description": "Extra practice on weak area"
+                            }
+                        ],
+                        "goals": [f"Master concept {i+1}", "Solve practice problems"],
+                        "estimated_hours": hours_per_day,
+                        "review_topics": [f"previous_topic_{i}"] if i > 0 else []
+                    }
+                    for i in range(days)
+                ],
+                "review_schedule": [
+                    {"day": 3, "topics": ["topic1", "topic2"], "type": "quick_review"},
+                    {"day": 6, "topics": ["all_week_topics"], "type": "comprehensive_review"}
+                ],
+                "assessment_checkpoints": [
+                    {"day": 3, "type": "quiz", "topics": ["topic1", "topic2"], "marks": 20, "duration_minutes": 30},
+                    {"day": 7, "type": "test", "topics": ["all_week"], "marks": 50, "duration_minutes": 60}
+                ],
+                "weak_topics_focus": [t.get('topic_id') for t in performance_data.get('weak_topics', [])[:5]],
+                "learning_objectives": ["Improve weak areas", "Build strong foundation"]
+            }
+        
+        # Row for ai_tutor_lesson_plans; the caller decides how to save it
+        lesson_plan_data = {
+            "user_id": user_id,
+            "subject": subject.value,
+            "plan_name": plan_data.get("plan_name", f"Personalized {subject.value} Plan"),
+            "plan_data": plan_data,
+            "based_on_performance": True,
+            "performance_snapshot": performance_data,
+            "start_date": today.isoformat(),
+            "end_date": (today + timedelta(days=days)).isoformat(),
+            "is_active": True
+        }
+        
+        return lesson_plan_data, {
+            "plan": plan_data,
+            "performance_data": performance_data,
+            "generated_at": now.isoformat()
+        }
+    
+    def _persist_lesson_plan_in_background(self, lesson_plan_data: Dict[str, Any]) -> str:
+        """Insert a lesson plan without waiting for the write; returns its client-generated id"""
+        return self._persist_lesson_plans_in_background([lesson_plan_data])[0]
+    
+    def _persist_lesson_plans_in_background(self, rows: List[Dict[str, Any]]) -> List[str]:
+        """Insert lesson plan rows in one multi-row insert without waiting; returns their ids"""
+        for row in rows:
+            row["id"] = str(uuid.uuid4())
+        
+        lesson_plan_ids = [row["id"] for row in rows]
+        self._spawn_background(
+            self._execute(self.supabase.table("ai_tutor_lesson_plans").insert(rows)),
+            f"save lesson plan(s) {lesson_plan_ids}"
+        )
+        return lesson_plan_ids
+    
     async def get_lesson_plans(
         self,
         user_id: str,
         subject: Optional[Subject] = None,
-        is_active: Optional[bool] = True
+        is_active: Optional[bool] = True,
+        limit: int = 20,
+        offset: int = 0
     ) -> List[Dict[str, Any]]:
-        """Get lesson plans for a user"""
+        """Get a page of lesson plan summaries for a user; use get_lesson_plan for plan_data"""
         try:
             query = self.supabase.table("ai_tutor_lesson_plans")\
-                .select("*")\
+                .select(LESSON_PLAN_LIST_COLUMNS)\
                 .eq("user_id", user_id)
             
             if subject:
@@ -1984,7 +2608,9 @@ The plan has been saved and you can access it anytime. Would you like me to expl
             if is_active is not None:
                 query = query.eq("is_active", is_active)
             
-            result = query.order("created_at", desc=True).execute()
+            query = query.order("created_at", desc=True)\
+                .range(offset, offset + limit - 1)
+            result = await self._execute(query)
             
             return result.data or []
             
@@ -1995,6 +2621,30 @@ The plan has been saved and you can access it anytime. Would you like me to expl
                 status_code=500
             )
     
+    async def get_lesson_plan(self, user_id: str, plan_id: str) -> Dict[str, Any]:
+        """Get a single lesson plan including its full plan_data"""
+        try:
+            query = self.supabase.table("ai_tutor_lesson_plans")\
+                .select("*")\
+                .eq("id", plan_id)\
+                .eq("user_id", user_id)\
+                .limit(1)
+            result = await self._execute(query)
+        except Exception as e:
+            raise APIException(
+                code="FETCH_LESSON_PLAN_ERROR",
+                message=f"Error fetching lesson plan: {str(e)}",
+                status_code=500
+            )
+        
+        if not result.data:
+            raise APIException(
+                code="LESSON_PLAN_NOT_FOUND",
+                message="Lesson plan not found",
+                status_code=404
+            )
+        return result.data[0]
+    
     async def get_teacher_student_sessions(
         self,
         teacher_id: str,
@@ -2003,43 +2653,70 @@ The plan has been saved and you can access it anytime. Would you like me to expl
     ) -> List[Dict[str, Any]]:
         """Get AI tutor sessions for students in teacher's school (limited access)"""
         try:
-            # Get teacher's school
-            teacher_profile = self.supabase.table("teacher_profiles")\
+            # The teacher's school is read on every request, not cached: it decides
+            # which students' sessions the teacher may see
+            teacher_query = self.supabase.table("teacher_profiles")\
                 .select("school_id")\
-                .eq("user_id", teacher_id)\
-                .execute()
+                .eq("user_id", teacher_id)
             
-            if not teacher_profile.data or not teacher_profile.data[0].get("school_id"):
-                return []  # Teacher not assigned to a school
+            if student_id:
+                # Look up both schools while fetching the student's sessions, then
+                # only return them if the schools match
+                student_query = self.supabase.table("student_profiles")\
+                    .select("school_id")\
+                    .eq("user_id", student_id)
+                sessions_query = self.supabase.table("ai_tutor_sessions")\
+                    .select("*")\
+                    .eq("user_id", student_id)\
+                    .order("last_message_at", desc=True)\
+                    .limit(limit)
+                teacher_profile, student_profiles, result = await asyncio.gather(
+                    self._execute(teacher_query),
+                    self._execute(student_query),
+                    self._execute(sessions_query)
+                )
+                school_id = teacher_profile.data[0].get("school_id") if teacher_profile.data else None
+                if not school_id:
+                    return []  # Teacher not assigned to a school
+                if not any(p.get("school_id") == school_id for p in (student_profiles.data or ())):
+                    return []  # Student not in teacher's school
+                return result.data or []
             
-            school_id = teacher_profile.data[0]["school_id"]
+            # Get teacher's school
+            teacher_profile = await self._execute(teacher_query)
+            school_id = teacher_profile.data[0].get("school_id") if teacher_profile.data else None
+            if not school_id:
+                return []  # Teacher not assigned to a school
             
             # Get students in the school
-            students_result = self.supabase.table("student_profiles")\
+            students_query = self.supabase.table("student_profiles")\
                 .select("user_id")\
-                .eq("school_id", school_id)\
-                .execute()
+                .eq("school_id", school_id)
+            students_result = await self._execute(students_query)
             
-            student_ids = [s["user_id"] for s in (students_result.data or [])]
+            student_ids = list({s["user_id"] for s in (students_result.data or ())})
             
             if not student_ids:
                 return []
             
-            # Filter by specific student if provided
-            if student_id:
-                if student_id not in student_ids:
-                    return []  # Student not in teacher's school
-                student_ids = [student_id]
+            # Get sessions for these students. PostgREST puts in_() values in the URL,
+            # so large schools are queried in batches and the results merged.
+            batch_queries = [
+                self.supabase.table("ai_tutor_sessions")\
+                    .select("*")\
+                    .in_("user_id", student_ids[i:i + STUDENT_ID_BATCH_SIZE])\
+                    .order("last_message_at", desc=True)\
+                    .limit(limit)
+                for i in range(0, len(student_ids), STUDENT_ID_BATCH_SIZE)
+            ]
+            results = await asyncio.gather(*(self._execute(q) for q in batch_queries))
             
-            # Get sessions for these students
-            result = self.supabase.table("ai_tutor_sessions")\
-                .select("*")\
-                .in_("user_id", student_ids)\
-                .order("last_message_at", desc=True)\
-                .limit(limit)\
-                .execute()
+            if len(results) == 1:
+                return results[0].data or []
             
-            return result.data or []
+            sessions = [row for result in results for row in (result.data or [])]
+            sessions.sort(key=lambda row: row.get("last_message_at") or "", reverse=True)
+            return sessions[:limit]
             
         except Exception as e:
             raise APIException(
@@ -2116,8 +2793,7 @@ The plan has been saved and you can access it anytime. Would you like me to expl
         try:
             # Get data from all sources
             learning_patterns = await self.memmachine.analyze_learning_patterns(user_id)
-            user_stats = await self.neo4j.get_user_learning_stats(user_id)
-            knowledge_gaps = await self.neo4j.analyze_knowledge_gaps(user_id)
+            user_stats, knowledge_gaps = await self.neo4j.get_user_stats_and_gaps(user_id)
             recommendations = await self.neo4j.recommend_next_concepts(user_id, limit=10)
             
             # Combine insights
@@ -8,6 +8,7 @@ import google.generativeai as genai
 
 from supabase import create_client, Client
 from app.config import settings
+from app.utils.model_helper import configure_gemini
 from app.models.exam import (
     ExamSet,
     ExamSetCreate,
@@ -23,7 +24,7 @@ from app.models.base import Subject
 from app.utils.exceptions import APIException
 
 # Configure Gemini
-genai.configure(api_key=settings.gemini_api_key)
+configure_gemini()
 
 
 class ExamService:
@@ -1,16 +1,30 @@
 """Google RAG service using Vertex AI Search and Grounding"""
 
 from typing import List, Optional, Dict, Any
+import asyncio
+import functools
 import google.generativeai as genai
 from google.cloud import discoveryengine_v1
 from google.cloud import aiplatform
 from app.config import settings
+from app.utils.model_helper import configure_gemini, generate_content_async
 from app.models.rag import RAGQuery, RAGResponse, RAGContext
 from app.utils.exceptions import RAGPipelineError
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Credential source resolved by the first successful _setup_authentication call.
+# Shared across instances so re-initialization skips the env/filesystem/ADC probes.
+_RESOLVED_AUTH: Optional[str] = None
+
+
+@functools.lru_cache(maxsize=1)
+def _default_credentials():
+    """Resolve Application Default Credentials once per process"""
+    import google.auth
+    return google.auth.default()
+
 
 class GoogleRAGService:
     """Service for RAG operations using Google's Vertex AI Search and Grounding"""
@@ -56,12 +70,17 @@ class GoogleRAGService:
     
     def _setup_authentication(self):
         """Set up Google Cloud authentication"""
+        global _RESOLVED_AUTH
+        if _RESOLVED_AUTH is not None:
+            return True
+        
         try:
             import os
             
             # Check if running on Google Cloud (ADC available)
             if os.getenv('GOOGLE_CLOUD_PROJECT') or os.getenv('GCLOUD_PROJECT'):
                 logger.info("Running on Google Cloud, using Application Default Credentials")
+                _RESOLVED_AUTH = "adc"
                 return True
             
             # Check for service account file
@@ -78,21 +97,22 @@ class GoogleRAGService:
                 for path in potential_paths:
                     if os.path.exists(path):
                         os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = path
-                        logger.info(f"Using service account from: {path}")
+                        logger.info("Using service account from: %s", path)
+                        _RESOLVED_AUTH = path
                         return True
             
             # Try to authenticate with default credentials
-            import google.auth
             try:
-                credentials, project = google.auth.default()
-                logger.info(f"Using default credentials for project: {project}")
+                credentials, project = _default_credentials()
+                logger.info("Using default credentials for project: %s", project)
+                _RESOLVED_AUTH = "default"
                 return True
             except Exception as e:
-                logger.warning(f"Could not authenticate with Google Cloud: {e}")
+                logger.warning("Could not authenticate with Google Cloud: %s", e)
                 return False
                 
         except Exception as e:
-            logger.error(f"Authentication setup failed: {e}")
+            logger.error("Authentication setup failed: %s", e)
             return False
     
     async def initialize(self):
@@ -106,7 +126,7 @@ class GoogleRAGService:
             
             # Initialize Gemini
             if settings.gemini_api_key:
-                genai.configure(api_key=settings.gemini_api_key)
+                configure_gemini()
                 self._gemini_initialized = True
                 logger.info("Gemini API initialized")
             else:
@@ -120,15 +140,32 @@ class GoogleRAGService:
                     self.search_client = discoveryengine_v1.SearchServiceClient()
                     logger.info("Vertex AI Search initialized")
                 except Exception as e:
-                    logger.warning(f"Could not initialize Vertex AI Search: {e}")
+                    logger.warning("Could not initialize Vertex AI Search: %s", e)
                     logger.info("Will use Gemini with grounding instead")
             else:
                 logger.info("Vertex AI Search not configured, using Gemini with grounding")
             
+            await self._prewarm()
+            
         except Exception as e:
-            logger.error(f"Failed to initialize Google RAG service: {e}")
+            logger.error("Failed to initialize Google RAG service: %s", e)
             self._use_fallback = True
     
+    async def _prewarm(self):
+        """Open the Gemini channel and mint credentials before the first user request"""
+        try:
+            # Resolved once per process; later _default_credentials() calls hit the cache
+            await asyncio.to_thread(_default_credentials)
+        except Exception as e:
+            logger.debug("Credential prewarm skipped: %s", e)
+        
+        try:
+            # Cheap metadata call; pays the TLS handshake off the request path
+            await asyncio.to_thread(genai.get_model, f"models/{settings.gemini_model}")
+            logger.info("Gemini channel prewarmed")
+        except Exception as e:
+            logger.debug("Gemini prewarm failed: %s", e)
+    
     def _get_fallback_content(self, query: str, subject: str) -> List[str]:
         """Get fallback content based on query and subject"""
         content_pieces = []
@@ -177,7 +214,7 @@ class GoogleRAGService:
                 try:
                     search_results = await self._search_with_vertex_ai(query)
                 except Exception as e:
-                    logger.warning(f"Vertex AI Search failed: {e}")
+                    logger.warning("Vertex AI Search failed: %s", e)
             
             # If no search results, try Gemini with grounding
             if not search_results:
@@ -187,7 +224,7 @@ class GoogleRAGService:
             return await self._generate_with_search_results(query, search_results)
             
         except Exception as e:
-            logger.error(f"Error in Google RAG query: {e}")
+            logger.error("Error in Google RAG query: %s", e)
             # Fallback to simple generation
             return await self._generate_fallback_response(query)
     
@@ -209,9 +246,20 @@ class GoogleRAGService:
                 )
             )
             
-            # Add subject filter if provided
+            # Add subject filter if provided, or a ranking boost when other subjects may still match
             if query.subject:
-                request.filter = f'subject: ANY("{query.subject.value}")'
+                subject_condition = f'subject: ANY("{query.subject.value}")'
+                if query.subject_as_boost:
+                    request.boost_spec = discoveryengine_v1.SearchRequest.BoostSpec(
+                        condition_boost_specs=[
+                            discoveryengine_v1.SearchRequest.BoostSpec.ConditionBoostSpec(
+                                condition=subject_condition,
+                                boost=0.5
+                            )
+                        ]
+                    )
+                else:
+                    request.filter = subject_condition
             
             # Execute search
             response = self.search_client.search(request=request)
@@ -232,7 +280,7 @@ class GoogleRAGService:
             return results
             
         except Exception as e:
-            logger.error(f"Vertex AI Search error: {e}")
+            logger.error("Vertex AI Search error: %s", e)
             return []
     
     async def _generate_with_grounding(self, query: RAGQuery) -> RAGResponse:
@@ -245,10 +293,10 @@ class GoogleRAGService:
             for model_name in model_names:
                 try:
                     model = genai.GenerativeModel(model_name)
-                    logger.info(f"Using Gemini model: {model_name}")
+                    logger.info("Using Gemini model: %s", model_name)
                     break
                 except Exception as e:
-                    logger.debug(f"Model {model_name} not available: {e}")
+                    logger.debug("Model %s not available: %s", model_name, e)
                     continue
             
             if model is None:
@@ -271,7 +319,8 @@ Provide a clear, accurate, and helpful response appropriate for Class 12 level.
                     {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
                 ]
                 
-                response = model.generate_content(
+                response = await generate_content_async(
+                    model,
                     prompt,
                     generation_config=genai.types.GenerationConfig(
                         temperature=0.1,
@@ -296,7 +345,7 @@ Provide a clear, accurate, and helpful response appropriate for Class 12 level.
                     generated_text = "I couldn't generate a response. Please try rephrasing your question."
                 
             except Exception as e:
-                logger.warning(f"Gemini generation failed: {e}")
+                logger.warning("Gemini generation failed: %s", e)
                 generated_text = "I'm having trouble generating a response right now. Please try again later."
             
             return RAGResponse(
@@ -312,7 +361,7 @@ Provide a clear, accurate, and helpful response appropriate for Class 12 level.
             )
             
         except Exception as e:
-            logger.error(f"Grounding generation failed: {e}")
+            logger.error("Grounding generation failed: %s", e)
             return await self._generate_fallback_response(query)
     
     async def _generate_with_search_results(self, query: RAGQuery, search_results: List[Dict]) -> RAGResponse:
@@ -393,8 +442,11 @@ Answer:"""
                 {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
             ]
             
-            response = model.generate_content(
+            # This is the answer the tutor shows, so stream it to a streaming caller
+            response = await generate_content_async(
+                model,
                 prompt,
+                stream_to_sink=True,
                 generation_config=genai.types.GenerationConfig(
                     temperature=0.1,
                     top_p=0.8,
@@ -433,7 +485,7 @@ Answer:"""
             )
             
         except Exception as e:
-            logger.error(f"Failed to generate with search results: {e}")
+            logger.error("Failed to generate with search results: %s", e)
             return await self._generate_fallback_response(query)
     
     async def _generate_fallback_response(self, query: RAGQuery) -> RAGResponse:
@@ -473,7 +525,8 @@ Provide a clear, accurate response appropriate for Class 12 level."""
                         {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
                     ]
                     
-                    response = model.generate_content(
+                    response = await generate_content_async(
+                        model,
                         prompt,
                         generation_config=genai.types.GenerationConfig(
                             temperature=0.2,
@@ -496,7 +549,7 @@ Provide a clear, accurate response appropriate for Class 12 level."""
                         generated_text = f"Here's what I know about this topic:\n\n{' '.join(fallback_content)}"
                     
                 except Exception as e:
-                    logger.warning(f"Fallback Gemini generation failed: {e}")
+                    logger.warning("Fallback Gemini generation failed: %s", e)
                     generated_text = f"I can help with this topic. {' '.join(fallback_content)}"
             else:
                 generated_text = f"Here's information about your question:\n\n{' '.join(fallback_content)}"
@@ -514,7 +567,7 @@ Provide a clear, accurate response appropriate for Class 12 level."""
             )
             
         except Exception as e:
-            logger.error(f"Fallback generation failed: {e}")
+            logger.error("Fallback generation failed: %s", e)
             return RAGResponse(
                 query=query.query,
                 generated_text="I'm experiencing technical difficulties. Please try again later.",
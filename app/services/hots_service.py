@@ -6,35 +6,27 @@ from datetime import datetime
 from decimal import Decimal
 
 from app.config import settings
+from app.utils.model_helper import configure_gemini
 from app.models.base import Subject
 from app.models.content import HOTSQuestion, HOTSQuestionCreate, DifficultyLevel
 from app.models.progress import Progress, ProgressUpdate
 from app.utils.exceptions import APIException
+from app.services.cache_service import cache_service, student_performance_key
 from supabase import create_client, Client
 
 # Initialize Supabase client
 supabase: Client = create_client(settings.supabase_url, settings.supabase_service_key)
 
 # Configure Gemini
-genai.configure(api_key=settings.gemini_api_key)
+configure_gemini()
 
 
 class HOTSService:
     """Service for HOTS question generation and tracking"""
     
     def __init__(self):
-        # Use faster model for better response times - can fallback if not available
-        # Use production model
-        try:
-            self.model = genai.GenerativeModel(model_name)
-        except:
-            # Fallback to standard if fast model not available
-            model_name = getattr(settings, 'gemini_model_standard', 'gemini-2.5-flash')
-            try:
-                self.model = genai.GenerativeModel(model_name)
-            except:
-                # Final fallback to flash
-                self.model = genai.GenerativeModel('gemini-2.5-flash')
+        # Use the configured production model
+        self.model = genai.GenerativeModel(settings.gemini_model)
     
     async def generate_hots_questions(
         self,
@@ -489,6 +481,7 @@ FEEDBACK: [Your detailed feedback here]"""
                 "last_practiced_at": datetime.utcnow().isoformat(),
                 "metadata": metadata
             }).execute()
+            await cache_service.delete(student_performance_key(user_id, subject))
     
     async def get_hots_performance(self, user_id: str) -> Dict[str, Any]:
         """
@@ -7,6 +7,7 @@ import google.generativeai as genai
 from supabase import create_client, Client
 
 from app.config import settings
+from app.utils.model_helper import configure_gemini
 from app.models.base import Message, Conversation, MessageCreate
 from app.utils.exceptions import APIException
 
@@ -24,7 +25,7 @@ class MessagesService:
         if not self._gemini_initialized:
             if not settings.gemini_api_key or not settings.gemini_api_key.strip():
                 raise Exception("Gemini API key is not configured")
-            genai.configure(api_key=settings.gemini_api_key)
+            configure_gemini()
             self._gemini_initialized = True
     
     def _get_supabase_client(self) -> Client:
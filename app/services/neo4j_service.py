@@ -547,6 +547,30 @@ class Neo4jService:
         performance_data: Dict[str, Any]
     ):
         """Update user's progress on a specific concept"""
+        progress = self._apply_progress_update(user_id, concept_name, performance_data)
+        logging.info(f"Updated progress for {user_id} on {concept_name}: {progress['mastery_level']:.2f}")
+    
+    async def batch_update_user_progress(
+        self,
+        user_id: str,
+        updates: List[Dict[str, Any]]
+    ):
+        """Update user's progress on several concepts in one call
+        
+        Each update is a dict with a 'concept' name plus the performance_data
+        fields accepted by update_user_progress (accuracy, engagement_score, ...).
+        """
+        for update in updates:
+            self._apply_progress_update(user_id, update['concept'], update)
+        logging.info(f"Updated progress for {user_id} on {len(updates)} concepts")
+    
+    def _apply_progress_update(
+        self,
+        user_id: str,
+        concept_name: str,
+        performance_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Apply one performance record to the user's concept progress and return it"""
         if user_id not in self.user_progress:
             self.user_progress[user_id] = {}
         
@@ -585,7 +609,7 @@ class Neo4jService:
             current_mastery = progress['mastery_level']
             progress['mastery_level'] = current_mastery * 0.7 + new_mastery * 0.3
         
-        logging.info(f"Updated progress for {user_id} on {concept_name}: {progress['mastery_level']:.2f}")
+        return progress
     
     async def get_user_learning_stats(self, user_id: str) -> Dict[str, Any]:
         """Get comprehensive learning statistics for a user"""
@@ -670,6 +694,86 @@ class Neo4jService:
         
         return relationships
     
+    async def get_concept_relationships_bulk(self, concept_names: List[str]) -> Dict[str, Dict[str, List[str]]]:
+        """Get relationships for several concepts in one query
+        
+        Returns a dict keyed by concept name, shaped like get_concept_relationships;
+        names that are not in the graph are left out.
+        """
+        if not concept_names:
+            return {}
+        
+        results = {}
+        
+        if self.driver:
+            # One round trip for all concepts; RELATES edges carry their type as a property
+            query = """
+            UNWIND $names AS name
+            MATCH (c:Concept {name: name})
+            OPTIONAL MATCH (c)-[outgoing:RELATES]->(target:Concept)
+            WITH c, collect({type: outgoing.type, name: target.name}) AS outgoing
+            OPTIONAL MATCH (source:Concept)-[incoming:RELATES]->(c)
+            RETURN c.name AS name, outgoing, collect({type: incoming.type, name: source.name}) AS incoming
+            """
+            
+            with self.driver.session() as session:
+                result = session.run(query, {'names': list(concept_names)})
+                for record in result:
+                    relationships = results.setdefault(record['name'], {
+                        'prerequisites': [],
+                        'dependents': [],
+                        'related': [],
+                        'applications': []
+                    })
+                    for rel in record['outgoing']:
+                        if rel['type'] == 'prerequisite':
+                            relationships['dependents'].append(rel['name'])
+                        elif rel['type'] == 'related':
+                            relationships['related'].append(rel['name'])
+                        elif rel['type'] == 'applies_to':
+                            relationships['applications'].append(rel['name'])
+                    for rel in record['incoming']:
+                        if rel['type'] == 'prerequisite':
+                            relationships['prerequisites'].append(rel['name'])
+                        elif rel['type'] == 'related':
+                            relationships['related'].append(rel['name'])
+        else:
+            # Use simulated graph: resolve all names, then walk the relationships once
+            wanted = set(concept_names)
+            names_by_id = {
+                concept_id: concept.name
+                for concept_id, concept in self.knowledge_graph['nodes'].items()
+                if concept.name in wanted
+            }
+            for concept_name in names_by_id.values():
+                results.setdefault(concept_name, {
+                    'prerequisites': [],
+                    'dependents': [],
+                    'related': [],
+                    'applications': []
+                })
+            
+            for rel in self.knowledge_graph['relationships'].values():
+                if rel.source_id in names_by_id:
+                    relationships = results[names_by_id[rel.source_id]]
+                    target_node = self.knowledge_graph['nodes'][rel.target_id]
+                    if rel.relationship_type == 'prerequisite':
+                        relationships['dependents'].append(target_node.name)
+                    elif rel.relationship_type == 'related':
+                        relationships['related'].append(target_node.name)
+                    elif rel.relationship_type == 'applies_to':
+                        relationships['applications'].append(target_node.name)
+                
+                if rel.target_id in names_by_id:
+                    relationships = results[names_by_id[rel.target_id]]
+                    source_node = self.knowledge_graph['nodes'][rel.source_id]
+                    if rel.relationship_type == 'prerequisite':
+                        relationships['prerequisites'].append(source_node.name)
+                    elif rel.relationship_type == 'related':
+                        relationships['related'].append(source_node.name)
+        
+        return results
+    
     async def recommend_next_concepts(self, user_id: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Recommend next concepts for the user to learn"""
         user_progress = await self.get_user_progress(user_id)
@@ -739,6 +843,23 @@ class Neo4jService:
         """Estimate learning duration for a single concept"""
         return await self._estimate_learning_duration([concept_name], user_id)
     
+    async def get_user_stats_and_gaps(self, user_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Get learning statistics and knowledge gaps for a user in one call
+        
+        Callers that need both (session setup, performance context) go through
+        here so they make a single round trip; users with no recorded progress
+        skip the per-concept gap analysis.
+        """
+        progress = await self.get_user_progress(user_id)
+        if not progress:
+            return await self.get_user_learning_stats(user_id), {
+                'missing_prerequisites': [],
+                'weak_areas': [],
+                'disconnected_knowledge': [],
+                'suggested_reviews': []
+            }
+        return await self.get_user_learning_stats(user_id), await self.analyze_knowledge_gaps(user_id)
+    
     async def analyze_knowledge_gaps(self, user_id: str) -> Dict[str, Any]:
         """Analyze knowledge gaps and suggest improvements"""
         user_progress = await self.get_user_progress(user_id)
@@ -14,6 +14,7 @@ from app.models.progress import (
 from app.models.base import Subject
 from app.utils.exceptions import APIException
 from app.config import settings
+from app.services.cache_service import cache_service, student_performance_key
 
 
 class ProgressService:
@@ -302,6 +303,7 @@ class ProgressService:
                 ).execute()
                 
                 progress = Progress(**response.data[0])
+                await cache_service.delete(student_performance_key(user_id, subject.value))
                 
                 # Log progress snapshot to BigQuery
                 if self.analytics_service:
@@ -346,6 +348,7 @@ class ProgressService:
                 response = self.supabase.table("progress").insert(create_data).execute()
                 
                 progress = Progress(**response.data[0])
+                await cache_service.delete(student_performance_key(user_id, subject.value))
                 
                 # Log progress snapshot to BigQuery
                 if self.analytics_service:
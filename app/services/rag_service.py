@@ -4,12 +4,27 @@ from typing import List, Optional, Dict
 import google.generativeai as genai
 from app.config import settings
 from app.models.rag import RAGQuery, RAGResponse, RAGContext
+from app.services.cache_service import cache_service
 from app.services.google_rag_service import google_rag_service
 from app.utils.exceptions import RAGPipelineError
+from app.utils.model_helper import token_sink
+import asyncio
+import hashlib
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Answers for a repeated query are served from cache for this long
+RAG_RESPONSE_CACHE_TTL = 600
+
+
+def rag_response_cache_key(query: RAGQuery) -> str:
+    """Cache key for a query: its normalized text plus every option that shapes the answer"""
+    params = query.model_dump(mode="json")
+    params["query"] = " ".join(query.query.lower().split())
+    return "rag:" + hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
 
 class RAGService:
     """Service for RAG pipeline operations using Google's RAG engine"""
@@ -18,13 +33,18 @@ class RAGService:
         """Initialize RAG service"""
         self.google_rag_service = google_rag_service
         self._initialized = False
+        # Startup and the first queries may all try to initialize at once
+        self._init_lock = asyncio.Lock()
     
     async def initialize(self):
         """Initialize the Google RAG service"""
-        if not self._initialized:
-            await self.google_rag_service.initialize()
-            self._initialized = True
-            logger.info("RAG service initialized with Google RAG engine")
+        if self._initialized:
+            return
+        async with self._init_lock:
+            if not self._initialized:
+                await self.google_rag_service.initialize()
+                self._initialized = True
+                logger.info("RAG service initialized with Google RAG engine")
     
     async def query(
         self,
@@ -44,18 +64,32 @@ class RAGService:
             if not self._initialized:
                 await self.initialize()
             
+            # Repeated questions skip retrieval and generation
+            cache_key = rag_response_cache_key(query)
+            cached = await cache_service.get(cache_key)
+            if cached is not None:
+                logger.info("Serving cached RAG response: %s...", query.query[:50])
+                response = RAGResponse.model_validate(cached)
+                # Streaming callers still receive the answer text
+                sink = token_sink.get()
+                if sink is not None and response.generated_text:
+                    sink.put_nowait(response.generated_text)
+                return response
+            
             # Use Google RAG service for processing
-            logger.info(f"Processing RAG query with Google RAG engine: {query.query[:50]}...")
+            logger.info("Processing RAG query with Google RAG engine: %s...", query.query[:50])
             response = await self.google_rag_service.query(query)
             logger.info("Successfully processed query with Google RAG engine")
+            
+            # Misses are not cached so newly indexed content is picked up straight away
+            if response.contexts:
+                await cache_service.set(cache_key, response.model_dump(mode="json"), RAG_RESPONSE_CACHE_TTL)
             return response
             
         except RAGPipelineError:
             raise
         except Exception as e:
-            logger.error(f"Unexpected error in RAG query: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Unexpected error in RAG query: %s", e)
             raise RAGPipelineError(f"Failed to process RAG query: {str(e)}")
     
     async def generate_embedding(self, text: str) -> List[float]:
@@ -2,16 +2,21 @@
 
 from datetime import datetime, date, timedelta
 from typing import List, Optional, Dict, Any
+import asyncio
+import hashlib
 import json
-import re
 import google.generativeai as genai
 from supabase import Client
-from app.config import settings
+from app.utils.model_helper import configure_gemini, extract_json_object
 from app.models.base import Subject
 from app.utils.exceptions import APIException
+from app.services.cache_service import cache_service
 
 # Configure Gemini
-genai.configure(api_key=settings.gemini_api_key)
+configure_gemini()
+
+# Generated lesson plans depend only on the prompt, so they can be shared for a while
+LESSON_PLAN_CACHE_TTL = 6 * 3600
 
 
 class TeacherService:
@@ -22,6 +27,10 @@ class TeacherService:
         # Initialize Gemini model - use 2.5 flash for best performance
         self.model = genai.GenerativeModel('gemini-2.5-flash')
     
+    async def _execute(self, query):
+        """Run a Supabase query off the event loop"""
+        return await asyncio.to_thread(query.execute)
+    
     async def generate_lesson_plan(
         self,
         teacher_id: str,
@@ -47,7 +56,7 @@ class TeacherService:
         """
         try:
             # Get topic content if available
-            topics_response = self.supabase.table('topics').select('*').eq('subject', subject.value).ilike('name', f'%{topic}%').limit(1).execute()
+            topics_response = await self._execute(self.supabase.table('topics').select('*').eq('subject', subject.value).ilike('name', f'%{topic}%').limit(1))
             topic_data = topics_response.data[0] if topics_response.data else None
             
             prompt = f"""Create a comprehensive lesson plan for Class {class_grade} {subject.value}.
@@ -90,19 +99,23 @@ Format as JSON:
   }}
 }}"""
 
-            response = self.model.generate_content(prompt)
-            plan_text = response.text
+            # Identical requests (same topic, duration, grade, objectives) reuse the parsed plan
+            cache_key = "lesson_plan:" + hashlib.sha256(f"{self.model.model_name}{prompt}".encode()).hexdigest()
+            plan_data = await cache_service.get(cache_key)
             
-            # Parse JSON response
-            json_match = re.search(r'\{.*\}', plan_text, re.DOTALL)
-            if json_match:
-                plan_data = json.loads(json_match.group())
-            else:
-                raise APIException(
-                    code="LESSON_PLAN_PARSING_ERROR",
-                    message="Failed to parse lesson plan response",
-                    status_code=500
-                )
+            if plan_data is None:
+                response = await asyncio.to_thread(self.model.generate_content, prompt)
+                plan_text = response.text
+                
+                # Parse JSON response
+                plan_data = extract_json_object(plan_text)
+                if plan_data is None:
+                    raise APIException(
+                        code="LESSON_PLAN_PARSING_ERROR",
+                        message="Failed to parse lesson plan response",
+                        status_code=500
+                    )
+                await cache_service.set(cache_key, plan_data, LESSON_PLAN_CACHE_TTL)
             
             return {
                 'teacher_id': teacher_id,
@@ -179,10 +192,8 @@ Format as JSON:
             assessment_text = response.text
             
             # Parse JSON response
-            json_match = re.search(r'\{.*\}', assessment_text, re.DOTALL)
-            if json_match:
-                assessment_data = json.loads(json_match.group())
-            else:
+            assessment_data = extract_json_object(assessment_text)
+            if assessment_data is None:
                 raise APIException(
                     code="ASSESSMENT_PARSING_ERROR",
                     message="Failed to parse assessment response",
@@ -225,23 +236,28 @@ Format as JSON:
             Formatted message ready to send
         """
         try:
-            # Get student information - use separate queries to avoid RLS issues
-            try:
-                student_profile_response = self.supabase.table('student_profiles').select('*').eq('user_id', student_id).limit(1).execute()
-                student_profile_data = student_profile_response.data[0] if student_profile_response.data and len(student_profile_response.data) > 0 else None
-            except Exception as e:
-                print(f"Warning: Could not fetch student profile: {str(e)}")
+            # Get student information - use separate queries to avoid RLS issues.
+            # The queries are independent, so issue them concurrently.
+            student_profile_response, profile_response, progress_response = await asyncio.gather(
+                self._execute(self.supabase.table('student_profiles').select('*').eq('user_id', student_id).limit(1)),
+                self._execute(self.supabase.table('profiles').select('*').eq('user_id', student_id).limit(1)),
+                self._execute(self.supabase.table('progress').select('*').eq('user_id', student_id).eq('subject', subject.value).limit(5)) if subject else asyncio.sleep(0),
+                return_exceptions=True
+            )
+            
+            if isinstance(student_profile_response, Exception):
+                print(f"Warning: Could not fetch student profile: {str(student_profile_response)}")
                 student_profile_data = None
+            else:
+                student_profile_data = student_profile_response.data[0] if student_profile_response.data and len(student_profile_response.data) > 0 else None
             
-            # Get profile separately
+            # Profile is only used alongside a student profile
             profile_data = None
             if student_profile_data:
-                try:
-                    profile_response = self.supabase.table('profiles').select('*').eq('user_id', student_id).limit(1).execute()
+                if isinstance(profile_response, Exception):
+                    print(f"Warning: Could not fetch profile: {str(profile_response)}")
+                else:
                     profile_data = profile_response.data[0] if profile_response.data and len(profile_response.data) > 0 else None
-                except Exception as e:
-                    print(f"Warning: Could not fetch profile: {str(e)}")
-                    profile_data = None
             
             student_data = {
                 **student_profile_data,
@@ -252,14 +268,15 @@ Format as JSON:
             progress_data = None
             if subject:
                 try:
-                    progress_response = self.supabase.table('progress').select('*').eq('user_id', student_id).eq('subject', subject.value).limit(5).execute()
+                    if isinstance(progress_response, Exception):
+                        raise progress_response
                     progress_data = progress_response.data or []
                     
                     # Get topic names separately if needed
                     if progress_data:
                         topic_ids = [p.get('topic_id') for p in progress_data if p.get('topic_id')]
                         if topic_ids:
-                            topics_response = self.supabase.table('topics').select('id, name').in_('id', topic_ids).execute()
+                            topics_response = await self._execute(self.supabase.table('topics').select('id, name').in_('id', topic_ids))
                             topics_map = {t['id']: t['name'] for t in (topics_response.data or [])}
                             for p in progress_data:
                                 p['topics'] = {'name': topics_map.get(p.get('topic_id'))}
@@ -324,10 +341,8 @@ Format as JSON:
             message_text = response.text
             
             # Parse JSON response
-            json_match = re.search(r'\{.*\}', message_text, re.DOTALL)
-            if json_match:
-                message_data = json.loads(json_match.group())
-            else:
+            message_data = extract_json_object(message_text)
+            if message_data is None:
                 # Get student name safely for fallback
                 student_name = 'your child'
                 if student_data:
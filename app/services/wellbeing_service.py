@@ -4,12 +4,12 @@ from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 import google.generativeai as genai
 from supabase import Client
-from app.config import settings
+from app.utils.model_helper import configure_gemini, JSON_OBJECT_RE
 from app.models.base import Subject
 from app.utils.exceptions import APIException
 
 # Configure Gemini
-genai.configure(api_key=settings.gemini_api_key)
+configure_gemini()
 
 
 class WellbeingService:
@@ -184,8 +184,7 @@ Format as JSON:
             
             # Parse JSON response
             import json
-            import re
-            json_match = re.search(r'\{.*\}', message_text, re.DOTALL)
+            json_match = JSON_OBJECT_RE.search(message_text)
             if json_match:
                 motivation_data = json.loads(json_match.group())
             else:
@@ -1,9 +1,48 @@
 """Helper utilities for AI model selection and configuration"""
 
+import asyncio
+import json
+import re
+from contextvars import ContextVar
 import google.generativeai as genai
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 from app.config import settings
 
+# Try to import orjson for faster parsing of model output, fallback to stdlib json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+_JSON_DECODER = json.JSONDecoder()
+
+# Greedy first-'{' to last-'}' match used by callers that parse model output with a regex
+JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+_gemini_configured = False
+
+# Set by streaming endpoints (see EnhancedAITutorService.stream_message) for the
+# duration of a turn; Gemini text generated with streaming enabled is pushed here
+# chunk by chunk as it arrives
+token_sink: ContextVar[Optional[asyncio.Queue]] = ContextVar("gemini_token_sink", default=None)
+
+
+def configure_gemini():
+    """
+    Configure the Gemini SDK once per process
+    
+    genai.configure() discards the SDK's cached clients, so calling it per request
+    or per service throws away the open connection and pays a fresh TLS
+    handshake on the next call. Every module configures through here instead.
+    The SDK's default transport is left as is.
+    """
+    global _gemini_configured
+    if not _gemini_configured:
+        genai.configure(api_key=settings.gemini_api_key)
+        _gemini_configured = True
+
 
 def get_gemini_model_with_fallback(use_fast: bool = True) -> Tuple[Optional[genai.GenerativeModel], Optional[str]]:
     """
@@ -19,7 +58,7 @@ def get_gemini_model_with_fallback(use_fast: bool = True) -> Tuple[Optional[gena
         return None, None
     
     try:
-        genai.configure(api_key=settings.gemini_api_key)
+        configure_gemini()
     except Exception as e:
         print(f"Failed to configure Gemini API: {e}")
         return None, None
@@ -64,6 +103,44 @@ def get_gemini_model_with_fallback(use_fast: bool = True) -> Tuple[Optional[gena
     return None, None
 
 
+async def generate_content_async(model: genai.GenerativeModel, prompt: str, stream_to_sink: bool = False, **kwargs):
+    """
+    Run model.generate_content on a worker thread so it does not block the event loop
+    
+    With stream_to_sink=True and a token sink set by a streaming caller, the
+    response is streamed and each text chunk is forwarded to the sink as it
+    arrives. Only pass stream_to_sink for text the caller will actually show.
+    
+    Args:
+        model: Gemini model
+        prompt: Prompt text
+        stream_to_sink: Forward chunks to token_sink when one is set
+        **kwargs: Passed through to generate_content
+        
+    Returns:
+        The GenerateContentResponse (fully resolved when streamed)
+    """
+    sink = token_sink.get() if stream_to_sink else None
+    if sink is None:
+        return await asyncio.to_thread(model.generate_content, prompt, **kwargs)
+    
+    loop = asyncio.get_running_loop()
+    
+    def run_streaming():
+        response = model.generate_content(prompt, stream=True, **kwargs)
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata only)
+                continue
+            if text:
+                loop.call_soon_threadsafe(sink.put_nowait, text)
+        return response
+    
+    return await asyncio.to_thread(run_streaming)
+
+
 def get_embedding_model_name() -> str:
     """Get the configured embedding model name"""
     return getattr(settings, 'vertex_ai_embedding_model', 'text-embedding-005')
@@ -74,3 +151,35 @@ def get_embedding_batch_size() -> int:
     return getattr(settings, 'embedding_batch_size', 50)
 
 
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Decode the JSON object embedded in model output
+    
+    Tries the span from the first '{' to the last '}' (bare JSON, or JSON wrapped
+    in prose/code fences) with orjson when available, then falls back to
+    JSONDecoder.raw_decode from the first '{', which stops at the matching brace.
+    Both are linear C-level scans, unlike a greedy DOTALL regex.
+    
+    Args:
+        text: Raw model response text
+        
+    Returns:
+        The decoded object, or None if no JSON object could be parsed
+    """
+    start = text.find('{')
+    if start < 0:
+        return None
+    
+    end = text.rfind('}')
+    if ORJSON_AVAILABLE and end > start:
+        try:
+            obj = orjson.loads(text[start:end + 1])
+            return obj if isinstance(obj, dict) else None
+        except orjson.JSONDecodeError:
+            pass
+    
+    try:
+        obj, _ = _JSON_DECODER.raw_decode(text, start)
+    except json.JSONDecodeError:
+        return None
+    return obj if isinstance(obj, dict) else None
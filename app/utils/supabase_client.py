@@ -0,0 +1,36 @@
+"""Shared Supabase client"""
+
+from typing import Optional
+from supabase import Client, create_client
+from app.config import settings
+from app.utils.exceptions import APIException
+
+_client: Optional[Client] = None
+
+
+def get_supabase_client() -> Client:
+    """Get the process-wide Supabase client, creating it on first use.
+
+    Every router goes through this one client so its HTTP connections are
+    kept alive and reused instead of being reopened on each request.
+    """
+    global _client
+    if _client is None:
+        if not settings.supabase_url or not settings.supabase_service_key:
+            raise APIException(
+                code="SUPABASE_CONFIG_MISSING",
+                message="Supabase configuration is missing. Please set SUPABASE_URL and SUPABASE_SERVICE_KEY.",
+                status_code=500
+            )
+        try:
+            _client = create_client(
+                settings.supabase_url,
+                settings.supabase_service_key
+            )
+        except Exception as e:
+            raise APIException(
+                code="SUPABASE_CLIENT_ERROR",
+                message=f"Failed to create Supabase client: {str(e)}",
+                status_code=500
+            )
+    return _client